@@ -1,10 +1,14 @@
+from smtplib import SMTPException
+
 from celery import shared_task
 
 from accounts.utils import custom_sen_mail
 from core.base_task import MyTask
+from core.exceptions import TRANSIENT_ERRORS
 
 
-@shared_task(base=MyTask, bind=True, task_time_limit=60, acks_late=True)
+@shared_task(base=MyTask, bind=True, task_time_limit=60, acks_late=True,
+             autoretry_for=(*TRANSIENT_ERRORS, SMTPException))
 def send_email_task(self, reset_link, email, correlation_id):
     custom_sen_mail('reset password', f"Your password rest link: {reset_link}", email)
 
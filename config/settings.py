@@ -198,12 +198,91 @@ CELERY_TIME_ZONE = 'Asia/Tehran'
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
 
 CELERY_BEAT_SCHEDULE = {
-    'update_rssfeeds': {
-        'task': 'rssfeeds.tasks.update_rssfeeds',
-        'schedule': crontab(minute=0, hour=3),
-    }
+    'schedule_due_feeds': {
+        'task': 'rssfeeds.tasks.schedule_due_feeds',
+        'schedule': crontab(minute='*/5'),
+        'args': (None,),
+    },
+    'prune_feed_archive': {
+        'task': 'rssfeeds.tasks.prune_feed_archive',
+        'schedule': crontab(minute=30, hour=4),
+        'args': (None,),
+    },
 }
 
+# Fetching runs on its own queue, consumed by the thread-pool 'celery_fetch' worker (see docker-compose.yml)
+# whose process may start the feed parse pool; every other stage of the ingest pipeline has a queue of its own
+CELERY_TASK_ROUTES = {
+    'rssfeeds.tasks.fetch_feeds_batch': {'queue': 'fetch'},
+    'rssfeeds.tasks.xml_link_creation': {'queue': 'fetch'},
+    'rssfeeds.tasks.parse_feed_stage': {'queue': 'parse'},
+    'rssfeeds.tasks.persist_feed_stage': {'queue': 'persist'},
+    'rssfeeds.tasks.index_feed_stage': {'queue': 'index'},
+    'rssfeeds.tasks.notify_feed_stage': {'queue': 'notify'},
+}
+
+# Feed fetching
+FEED_FETCH_BATCH_SIZE = int(os.environ.get('FEED_FETCH_BATCH_SIZE', 200))
+FEED_FETCH_CONCURRENCY = int(os.environ.get('FEED_FETCH_CONCURRENCY', 100))
+FEED_FETCH_PER_HOST_CONCURRENCY = int(os.environ.get('FEED_FETCH_PER_HOST_CONCURRENCY', 6))
+FEED_FETCH_TIMEOUT = int(os.environ.get('FEED_FETCH_TIMEOUT', 30))
+# Downloads are aborted once the (decoded) body exceeds FEED_MAX_BODY_BYTES, or up front when the response
+# declares one of the FEED_REJECTED_CONTENT_TYPES (prefixes)
+FEED_MAX_BODY_BYTES = int(os.environ.get('FEED_MAX_BODY_BYTES', 20 * 1024 * 1024))
+FEED_REJECTED_CONTENT_TYPES = ['image/', 'audio/', 'video/', 'font/', 'application/json', 'application/pdf',
+                               'application/zip']
+# Seconds that feed bodies and parsed feeds handed between ingest pipeline stages are kept in Redis
+FEED_PAYLOAD_TTL = int(os.environ.get('FEED_PAYLOAD_TTL', 3600))
+# Processes parsing fetched bodies off the fetch worker; 0 parses inline in the fetching worker
+FEED_PARSE_WORKERS = int(os.environ.get('FEED_PARSE_WORKERS', os.cpu_count() or 1))
+FEED_HTTP_POOL_MAXSIZE = int(os.environ.get('FEED_HTTP_POOL_MAXSIZE', 4))
+FEED_HTTP_MAX_SESSIONS = int(os.environ.get('FEED_HTTP_MAX_SESSIONS', 500))
+# (tokens per second, burst) per host; FEED_HOST_RATE_LIMITS keys match the host and its subdomains
+FEED_RATE_LIMIT_DEFAULT = (2, 10)
+FEED_HOST_RATE_LIMITS = {}
+FEED_RATE_LIMIT_MAX_WAIT = 30
+FEED_RETRY_AFTER_DEFAULT = 60
+
+# Adaptive polling: each feed is refetched after FEED_POLL_INTERVAL_FACTOR x the median gap between its
+# last FEED_POLL_SAMPLE_SIZE items, within [FEED_MIN_POLL_INTERVAL, FEED_MAX_POLL_INTERVAL]
+FEED_POLL_SAMPLE_SIZE = 20
+FEED_POLL_INTERVAL_FACTOR = 0.5
+FEED_MIN_POLL_INTERVAL = timedelta(minutes=15)
+FEED_MAX_POLL_INTERVAL = timedelta(days=3)
+FEED_DEFAULT_POLL_INTERVAL = timedelta(hours=6)
+FEED_SCHEDULER_MAX_FEEDS = int(os.environ.get('FEED_SCHEDULER_MAX_FEEDS', 2000))
+FEED_SCHEDULER_LEASE = timedelta(hours=1)
+# A feed refresh holds a Redis lease from enqueue to completion so it is never queued twice; the lease
+# expires after FEED_LEASE_TTL seconds in case its task dies
+FEED_LEASE_TTL = int(os.environ.get('FEED_LEASE_TTL', 1800))
+# Feed health: a failing feed is refetched after FEED_FAILURE_BACKOFF, doubled for every further consecutive
+# failure up to FEED_MAX_FAILURE_BACKOFF, and quarantined (no longer fetched until released in the admin or
+# the feed_health API) after FEED_QUARANTINE_FAILURES consecutive failures
+FEED_FAILURE_BACKOFF = timedelta(minutes=15)
+FEED_MAX_FAILURE_BACKOFF = timedelta(days=7)
+FEED_QUARANTINE_FAILURES = int(os.environ.get('FEED_QUARANTINE_FAILURES', 10))
+# Weight of the latest fetch in the moving averages of a feed's fetch latency and body size
+FEED_HEALTH_EWMA_ALPHA = 0.3
+FEED_NORMALIZED_HASH = os.environ.get('FEED_NORMALIZED_HASH', 'True') == 'True'
+FEED_VOLATILE_ELEMENTS = ['lastBuildDate', 'generator', 'ttl']
+# Bodies larger than this (bytes) are parsed incrementally, items being persisted in FEED_ITEM_BATCH_SIZE chunks
+FEED_STREAM_PARSE_THRESHOLD = int(os.environ.get('FEED_STREAM_PARSE_THRESHOLD', 1024 * 1024))
+FEED_ITEM_BATCH_SIZE = int(os.environ.get('FEED_ITEM_BATCH_SIZE', 500))
+# Incremental ingest: stop parsing after this many consecutive already-known items, and rescan every item
+# of a feed once per FEED_FULL_SCAN_INTERVAL to catch feeds that reorder or backdate items
+FEED_EARLY_STOP_KNOWN_RUN = 10
+FEED_RECENT_GUIDS = 200
+FEED_FULL_SCAN_INTERVAL = timedelta(days=7)
+# XML engine used by the feed parsers: 'lxml' (falls back to 'etree' when lxml is not installed) or 'etree'
+FEED_XML_BACKEND = os.environ.get('FEED_XML_BACKEND', 'lxml')
+# Every new feed body is appended to a local archive of compressed segments, so feeds can be re-ingested
+# with replay_feed_archive without refetching them. The archive lives on its own data volume (see
+# docker-compose.yml), and prune_feed_archive keeps only the FEED_ARCHIVE_KEEP_VERSIONS latest bodies of a feed
+FEED_ARCHIVE_ENABLED = os.environ.get('FEED_ARCHIVE_ENABLED', 'True') == 'True'
+FEED_ARCHIVE_DIR = Path(os.environ.get('FEED_ARCHIVE_DIR', '/var/lib/rssfeeds/feed_archive'))
+FEED_ARCHIVE_KEEP_VERSIONS = int(os.environ.get('FEED_ARCHIVE_KEEP_VERSIONS', 10))
+FEED_ARCHIVE_SEGMENT_SIZE = int(os.environ.get('FEED_ARCHIVE_SEGMENT_SIZE', 256 * 1024 * 1024))
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
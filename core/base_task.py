@@ -1,10 +1,20 @@
 from celery import Task
 
+from core.exceptions import TRANSIENT_ERRORS
+from rssfeeds.single_flight import get_feed_leases
 from rssfeeds.utils import log_task_info
 
 
 class MyTask(Task):
-    autoretry_for = (Exception,)
+    """
+    Base task that retries with exponential backoff on transient errors only (see core.exceptions); parse,
+    validation and other permanent errors fail the task on the first attempt.
+
+    A task enqueued with a `lease` kwarg (see rssfeeds.single_flight) releases it once it succeeds or fails for
+    good, whatever the error; a retry keeps it. A task that hands the lease on to the tasks it enqueues calls
+    hand_on_lease(), and the last of them releases it.
+    """
+    autoretry_for = TRANSIENT_ERRORS
     retry_kwargs = {'max_retries': 5}
     retry_backoff = True
     retry_jitter = False
@@ -14,15 +24,28 @@ class MyTask(Task):
               eta=None, countdown=None, max_retries=None, **options):
         retry_count = self.request.retries
         retry_eta = eta or (countdown and f'countdown={countdown}') or 'default'
+        # Autoretry and self.retry(exc=...) leave args and kwargs to the request the retry is sent with
+        log_args = self.request.args if args is None else args
+        log_kwargs = self.request.kwargs if kwargs is None else kwargs
         log_task_info(self.name, 'warning', f'Retrying task {self.name} (retry {retry_count}) in {retry_eta} seconds',
-                      self.request.id, args, kwargs, exception=exc, retry_count=retry_count, max_retries=max_retries,
+                      self.request.id, log_args, log_kwargs, exception=exc, retry_count=retry_count, max_retries=max_retries,
                       retry_eta=retry_eta)
 
         super().retry(args, kwargs, exc, throw, eta, countdown, max_retries, **options)
 
+    def hand_on_lease(self):
+        self.request.lease_handed_on = True
+
+    def release_lease(self, kwargs):
+        lease = (kwargs or {}).get('lease')
+        if lease and not self.request.get('lease_handed_on'):
+            get_feed_leases().release(lease['names'], lease['token'])
+
     def on_failure(self, exc, task_id, args, kwargs, einfo):
         log_task_info(self.name, 'error', f'Task {self.name} failed: {str(exc)}',
                       task_id, args, kwargs, exception=exc)
+        self.release_lease(kwargs)
 
     def on_success(self, retval, task_id, args, kwargs):
         log_task_info(self.name, 'info', f'Task {self.name} completed successfully', task_id, args, kwargs, retval)
+        self.release_lease(kwargs)
@@ -0,0 +1,108 @@
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Category
+
+
+class CategoryResolver:
+    """
+    Process-wide cache mapping (name, parent id) to Category ids.
+
+    Feeds reference the same few hundred iTunes categories on every refresh, so once the cache is warm a
+    category tree resolves without any query. Missing categories are created level by level with one
+    bulk INSERT per depth, which also covers trees nested deeper than category/subcategory, and get their
+    materialized path set with one bulk UPDATE per depth.
+
+    Categories are created inside the caller's transaction, so they only enter the cache once it commits; a
+    rolled-back refresh leaves the cache as it was. A category that predates the materialized paths and has
+    none yet gets it computed from its ancestors when a child is created under it.
+
+    Methods:
+        warm(): Load every existing category into the cache.
+        resolve(nodes): Return the ids of all categories of a CategoryNode forest, creating missing ones.
+        clear(): Drop the cache, e.g. after categories were deleted.
+    """
+
+    def __init__(self):
+        self._ids = {}
+        self._paths = {}
+        self._warm = False
+
+    def warm(self):
+        self._ids = {}
+        self._paths = {}
+        for pk, name, parent_id, path in Category.objects.values_list('id', 'name', 'parent_id', 'path'):
+            self._ids[(name, parent_id)] = pk
+            self._paths[pk] = path
+        self._warm = True
+
+    def clear(self):
+        self._ids = {}
+        self._paths = {}
+        self._warm = False
+
+    def resolve(self, nodes):
+        """
+        Resolve a forest of CategoryNode objects to Category ids.
+
+        Args:
+            nodes (list): Top-level CategoryNode objects, as returned by Parser.get_categories.
+
+        Returns:
+            list: Ids of every category in the forest, parents before their children.
+        """
+        if not self._warm:
+            self.warm()
+
+        # Ids and paths found or created by this call, cached once the caller's transaction commits
+        ids = {}
+        paths = {}
+        category_ids = []
+        level = [(node, None) for node in nodes if node.name]
+        while level:
+            missing = {(node.name, parent_id) for node, parent_id in level} - self._ids.keys()
+            if missing:
+                self._create(missing, ids, paths)
+
+            next_level = []
+            for node, parent_id in level:
+                key = (node.name, parent_id)
+                category_id = ids[key] if key in ids else self._ids[key]
+                category_ids.append(category_id)
+                next_level.extend((child, category_id) for child in node.children if child.name)
+            level = next_level
+        if ids:
+            transaction.on_commit(lambda: self._publish(ids, paths))
+        return category_ids
+
+    def _publish(self, ids, paths):
+        self._ids.update(ids)
+        self._paths.update(paths)
+
+    def _create(self, keys, ids, paths):
+        Category.objects.bulk_create([Category(name=name, parent_id=parent_id) for name, parent_id in keys],
+                                     ignore_conflicts=True)
+        lookup = Q()
+        for name, parent_id in keys:
+            lookup |= Q(name=name, parent_id=parent_id)
+        without_path = {}
+        for pk, name, parent_id, path in Category.objects.filter(lookup).values_list('id', 'name', 'parent_id',
+                                                                                     'path'):
+            if not path:
+                path = f'{self._get_path(parent_id, paths, without_path) if parent_id else ""}{pk}/'
+                without_path[pk] = path
+            ids[(name, parent_id)] = pk
+            paths[pk] = path
+        Category.objects.bulk_update([Category(pk=pk, path=path) for pk, path in without_path.items()], ['path'])
+
+    def _get_path(self, pk, paths, without_path):
+        path = paths.get(pk) or self._paths.get(pk)
+        if not path:
+            # The category predates the materialized paths (see rebuild_category_paths)
+            parent_id = Category.objects.filter(pk=pk).values_list('parent_id', flat=True).get()
+            path = f'{self._get_path(parent_id, paths, without_path) if parent_id else ""}{pk}/'
+            paths[pk] = without_path[pk] = path
+        return path
+
+
+category_resolver = CategoryResolver()
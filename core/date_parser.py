@@ -0,0 +1,152 @@
+import re
+from datetime import datetime, timedelta, timezone
+
+MONTHS = {name: number for number, name in enumerate(
+    ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'), start=1)}
+
+# Named zones seen in RFC-822 feed dates, as offsets in hours; unknown names are read as UTC (RFC 2822 4.3)
+ZONES = {
+    'UT': 0, 'UTC': 0, 'GMT': 0, 'Z': 0,
+    'EST': -5, 'EDT': -4, 'CST': -6, 'CDT': -5, 'MST': -7, 'MDT': -6, 'PST': -8, 'PDT': -7,
+    'AKST': -9, 'AKDT': -8, 'HST': -10, 'BST': 1, 'CET': 1, 'CEST': 2, 'EET': 2, 'EEST': 3,
+    'MSK': 3, 'IRST': 3.5, 'JST': 9, 'KST': 9, 'AEST': 10, 'AEDT': 11,
+}
+
+RFC822_RE = re.compile(
+    r'\s*(?:[A-Za-z]+,?\s*)?(\d{1,2})[\s-]+([A-Za-z]{3})[A-Za-z]*\.?[\s-]+(\d{2,4})\s+'
+    r'(\d{1,2}):(\d{2})(?::(\d{2}))?(?:\.\d+)?\s*([+-]\d{2}:?\d{2}|[A-Za-z]+)?\s*$'
+)
+ISO8601_RE = re.compile(
+    r'\s*(\d{4})-(\d{2})-(\d{2})(?:[Tt ](\d{2}):(\d{2})(?::(\d{2})(?:[.,](\d+))?)?)?'
+    r'\s*([Zz]|[+-]\d{2}(?::?\d{2})?)?\s*$'
+)
+
+# Formats tried with strptime, in order, when neither fast path matches
+FALLBACK_FORMATS = (
+    '%Y/%m/%d %H:%M:%S',
+    '%m/%d/%Y %H:%M:%S',
+    '%a %b %d %H:%M:%S %z %Y',
+    '%a %b %d %Y %H:%M:%S',
+)
+
+_tz_cache = {0: timezone.utc}
+
+
+def get_tz(minutes):
+    tz = _tz_cache.get(minutes)
+    if tz is None:
+        tz = _tz_cache[minutes] = timezone(timedelta(minutes=minutes))
+    return tz
+
+
+def parse_offset(value):
+    """
+    Convert a numeric offset ('+0330', '-05:00', '+02') or a zone name to minutes east of UTC.
+    """
+    if value[0] in '+-':
+        digits = value[1:].replace(':', '')
+        minutes = int(digits[:2]) * 60 + int(digits[2:4] or 0)
+        return -minutes if value[0] == '-' else minutes
+    return int(ZONES.get(value.upper(), 0) * 60)
+
+
+def parse_rfc822(value):
+    match = RFC822_RE.match(value)
+    if match is None:
+        return None
+    day, month, year, hour, minute, second, zone = match.groups()
+    month = MONTHS.get(month.lower())
+    if month is None:
+        return None
+    year = int(year)
+    if year < 100:
+        year += 2000 if year < 50 else 1900
+    try:
+        return datetime(year, month, int(day), int(hour), int(minute), int(second or 0),
+                        tzinfo=get_tz(parse_offset(zone) if zone else 0))
+    except ValueError:
+        return None
+
+
+def parse_iso8601(value):
+    match = ISO8601_RE.match(value)
+    if match is None:
+        return None
+    year, month, day, hour, minute, second, fraction, zone = match.groups()
+    try:
+        return datetime(int(year), int(month), int(day), int(hour or 0), int(minute or 0), int(second or 0),
+                        int(fraction[:6].ljust(6, '0')) if fraction else 0,
+                        tzinfo=get_tz(parse_offset(zone) if zone else 0))
+    except ValueError:
+        return None
+
+
+def make_strptime_parser(date_format):
+    def parse(value):
+        try:
+            parsed = datetime.strptime(value.strip(), date_format)
+        except ValueError:
+            return None
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    parse.__name__ = date_format
+    return parse
+
+
+PARSERS = (parse_rfc822, parse_iso8601) + tuple(
+    make_strptime_parser(date_format) for date_format in FALLBACK_FORMATS
+)
+
+
+class DateParser:
+    """
+    Tolerant parser for the publication dates of a single feed.
+
+    A feed formats all of its dates the same way, so the parser remembers which format last succeeded and
+    tries it first. RFC-822 (including named zones such as 'EST') and ISO-8601 are handled by regex fast
+    paths; a few other layouts seen in the wild fall back to strptime. Dates without a zone are taken as
+    UTC, so every parsed date is timezone-aware. Unparseable dates return None and are counted instead of
+    raising, so one odd date never aborts a feed.
+
+    Attributes:
+        parser (callable or None): The format that matched the last date.
+        parsed (int): Number of dates parsed.
+        failures (int): Number of non-empty dates that could not be parsed.
+
+    Methods:
+        parse(value): Parse a date string into an aware datetime, or return None.
+    """
+
+    def __init__(self):
+        self.parser = None
+        self.parsed = 0
+        self.failures = 0
+
+    def parse(self, value):
+        """
+        Parse a date string.
+
+        Args:
+            value (str): The date string, e.g. the text of a <pubDate> element.
+
+        Returns:
+            datetime: The parsed, timezone-aware date, or None if value is empty or not a recognised date.
+        """
+        if not value:
+            return None
+        if self.parser is not None:
+            parsed = self.parser(value)
+            if parsed is not None:
+                self.parsed += 1
+                return parsed
+
+        for parser in PARSERS:
+            if parser is self.parser:
+                continue
+            parsed = parser(value)
+            if parsed is not None:
+                self.parser = parser
+                self.parsed += 1
+                return parsed
+
+        self.failures += 1
+        return None
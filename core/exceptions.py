@@ -0,0 +1,107 @@
+import aiohttp
+import requests
+from django.db import InterfaceError, OperationalError
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+
+
+class TransientError(Exception):
+    """
+    Base class of errors caused by a temporary condition (a throttled host, a 5xx answer, ...); retrying the
+    same work later can succeed.
+    """
+
+
+class PermanentError(Exception):
+    """
+    Base class of errors that repeating the same work cannot fix, e.g. a malformed or unsupported feed
+    body; tasks fail right away instead of retrying.
+
+    Attributes:
+        snippet (str): The offending part of the input, if known.
+    """
+
+    def __init__(self, *args, snippet=''):
+        super().__init__(*args)
+        self.snippet = snippet
+
+
+class MalformedFeed(PermanentError):
+    """
+    Raised when a feed body is not well-formed XML.
+    """
+
+
+class UnparsableFeed(PermanentError):
+    """
+    Raised when parsing a feed body fails with an unexpected error, e.g. a parser bug triggered by an unusual
+    feed. Parsing is deterministic, so the same body fails again; the original error is the cause.
+    """
+
+
+class HTTPStatusError:
+    """
+    Mixin for errors raised for an HTTP error answer.
+
+    Attributes:
+        url (str): The requested URL.
+        status_code (int): The HTTP status of the answer.
+    """
+
+    def __init__(self, url, status_code):
+        self.url = url
+        self.status_code = status_code
+        super().__init__(f'{url} answered HTTP {status_code}')
+
+    def __reduce__(self):
+        return type(self), (self.url, self.status_code)
+
+
+class TransientHTTPError(HTTPStatusError, TransientError):
+    """
+    Raised for HTTP answers worth retrying: 408, 425, 429 and 5xx.
+    """
+
+
+class PermanentHTTPError(HTTPStatusError, PermanentError):
+    """
+    Raised for HTTP error answers that a retry will not change, e.g. 404 or 410.
+    """
+
+
+TRANSIENT_HTTP_STATUSES = {408, 425, 429}
+
+
+def http_error(url, status_code):
+    """
+    Return the TransientHTTPError or PermanentHTTPError for an HTTP error status.
+    """
+    if status_code in TRANSIENT_HTTP_STATUSES or status_code >= 500:
+        return TransientHTTPError(url, status_code)
+    return PermanentHTTPError(url, status_code)
+
+
+# Errors a task is retried for: our own transient errors plus network, database connection and Redis
+# connection failures raised by the libraries. Everything else, bugs included, fails the task right away.
+TRANSIENT_ERRORS = (
+    TransientError,
+    ConnectionError,
+    TimeoutError,
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+    OperationalError,
+    InterfaceError,
+    RedisConnectionError,
+    RedisTimeoutError,
+)
+
+# Errors that are the feed's fault rather than ours: they count against the feed's health (see
+# rssfeeds.health). Outages of our own database, Redis, Elasticsearch or broker never do.
+FEED_ERRORS = (
+    PermanentError,
+    TransientHTTPError,
+    aiohttp.ClientError,
+    requests.ConnectionError,
+    requests.Timeout,
+    TimeoutError,
+)
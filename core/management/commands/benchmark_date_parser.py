@@ -0,0 +1,75 @@
+import timeit
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+
+from core.date_parser import DateParser
+
+SAMPLES = {
+    'rfc822': 'Mon, 01 Jan 2024 10:00:00 +0000',
+    'rfc822-named-zone': 'Tue, 2 Jan 2024 10:00:00 EST',
+    'iso8601': '2024-01-03T10:00:00+03:30',
+    'iso8601-utc': '2024-01-03T10:00:00Z',
+    'fallback': '01/05/2024 10:00:00',
+    'invalid': 'not a date',
+}
+
+
+def parse_with_strptime(value):
+    """
+    The strptime chain DateParser replaced, kept as the baseline; it raises on dates it does not know.
+    """
+    try:
+        return datetime.strptime(value, '%a, %d %b %Y %H:%M:%S %z')
+    except ValueError:
+        try:
+            return datetime.strptime(value.replace('T', ' ').replace('Z', ''), '%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            return datetime.strptime(value, '%a, %d %b %Y %H:%M:%S %Z')
+
+
+class Command(BaseCommand):
+    """
+    Custom management command to micro-benchmark feed date parsing.
+
+    For each sample date format it reports the time per date of the strptime baseline, of a DateParser
+    that already remembers the feed's format and of a fresh DateParser per date.
+
+    Usage:
+        python manage.py benchmark_date_parser --number 100000
+    """
+
+    help = 'Micro-benchmarks DateParser against the strptime baseline.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--number', type=int, default=100000, help='Dates parsed per measurement.')
+
+    def handle(self, *args, **options):
+        """
+        Handles the execution of the management command.
+
+        Args:
+            args: Additional command-line arguments.
+            options: Additional command-line options.
+        """
+        number = options['number']
+        self.stdout.write(f'{"format":<20}{"strptime":>12}{"memoized":>12}{"cold":>12}   (us per date)')
+        for name, value in SAMPLES.items():
+            parser = DateParser()
+            parser.parse(value)
+            timings = [
+                self.measure(parse_with_strptime, value, number),
+                self.measure(parser.parse, value, number),
+                self.measure(lambda v: DateParser().parse(v), value, number),
+            ]
+            self.stdout.write(f'{name:<20}' + ''.join(
+                f'{timing:>12.2f}' if timing is not None else f'{"error":>12}' for timing in timings
+            ))
+
+    @staticmethod
+    def measure(func, value, number):
+        try:
+            func(value)
+        except ValueError:
+            return None
+        return timeit.timeit(lambda: func(value), number=number) / number * 1e6
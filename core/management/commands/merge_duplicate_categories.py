@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Min, Sum
+
+from core.models import Category
+from interactions.models import Recommendation
+from rssfeeds.models import Channel
+
+
+class Command(BaseCommand):
+    """
+    Custom management command to merge categories that share a name and parent into the oldest of them.
+
+    Categories are unique per (name, parent) now, and the generated migration fails on a database that
+    already holds duplicates, so this runs once before migrating. Channels, subcategories and the
+    recommendation counts of the duplicates are moved to the kept category. Merging two parents can make
+    their subcategories duplicates in turn, so the merge repeats until none are left. Only the columns that
+    predate the migration are read.
+
+    Usage:
+        python manage.py merge_duplicate_categories
+    """
+
+    help = 'Merges categories with the same name and parent before the unique constraints are applied.'
+
+    def handle(self, *args, **options):
+        """
+        Handles the execution of the management command.
+
+        Args:
+            args: Additional command-line arguments.
+            options: Additional command-line options.
+        """
+        merged = 0
+        with transaction.atomic():
+            while groups := list(
+                Category.objects.values('name', 'parent_id').annotate(copies=Count('id'), keep=Min('id'))
+                .filter(copies__gt=1)
+            ):
+                for group in groups:
+                    duplicate_ids = list(
+                        Category.objects.filter(name=group['name'], parent_id=group['parent_id'])
+                        .exclude(pk=group['keep']).values_list('id', flat=True)
+                    )
+                    self.merge(group['keep'], duplicate_ids)
+                    merged += len(duplicate_ids)
+        self.stdout.write(self.style.SUCCESS(f'Merged {merged} duplicate categories.'))
+
+    def merge(self, keep_id, duplicate_ids):
+        category_ids = [keep_id, *duplicate_ids]
+        Category.objects.filter(parent_id__in=duplicate_ids).update(parent_id=keep_id)
+
+        through = Channel.category.through
+        channel_ids = set(through.objects.filter(category_id__in=duplicate_ids).values_list('channel_id', flat=True))
+        through.objects.filter(category_id__in=duplicate_ids).delete()
+        through.objects.bulk_create([through(channel_id=channel_id, category_id=keep_id) for channel_id in channel_ids],
+                                    ignore_conflicts=True)
+
+        recommendations = Recommendation.objects.filter(
+            category_id__in=category_ids,
+            user_id__in=Recommendation.objects.filter(category_id__in=duplicate_ids).values('user_id'),
+        )
+        counts = list(recommendations.values('user_id').annotate(total=Sum('count')))
+        recommendations.delete()
+        Recommendation.objects.bulk_create([Recommendation(user_id=row['user_id'], category_id=keep_id,
+                                                           count=row['total']) for row in counts])
+
+        Category.objects.filter(pk__in=duplicate_ids).only('id').delete()
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Category
+
+
+class Command(BaseCommand):
+    """
+    Custom management command to recompute the materialized path of every Category.
+
+    Categories are walked breadth-first from the roots, so every parent path is known before its children.
+
+    Usage:
+        python manage.py rebuild_category_paths
+    """
+
+    help = 'Rebuilds the materialized ancestry path of every category.'
+
+    def handle(self, *args, **options):
+        """
+        Handles the execution of the management command.
+
+        Args:
+            args: Additional command-line arguments.
+            options: Additional command-line options.
+        """
+        children = {}
+        for category in Category.objects.only('id', 'parent_id', 'path'):
+            children.setdefault(category.parent_id, []).append(category)
+
+        changed = []
+        level = [(category, '') for category in children.get(None, [])]
+        while level:
+            next_level = []
+            for category, parent_path in level:
+                path = f'{parent_path}{category.pk}/'
+                if category.path != path:
+                    category.path = path
+                    changed.append(category)
+                next_level.extend((child, path) for child in children.get(category.pk, []))
+            level = next_level
+
+        Category.objects.bulk_update(changed, ['path'], batch_size=1000)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the path of {len(changed)} categories.'))
@@ -0,0 +1,11 @@
+from django.db import models
+
+
+class CategoryQuerySet(models.QuerySet):
+    def subtree(self, category):
+        """
+        Return the category and all of its descendants with a single indexed prefix lookup.
+        """
+        if not category.path:
+            return self.filter(pk=category.pk)
+        return self.filter(path__startswith=category.path)
@@ -1,14 +1,62 @@
 from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Concat, Substr
+
+from .manager import CategoryQuerySet
 
 
 # Create your models here.
 class Category(models.Model):
     name = models.CharField(max_length=100)
     parent = models.ForeignKey('self', on_delete=models.SET_NULL, blank=True, null=True, related_name='categories')
+    # Materialized path of ancestor ids, e.g. '3/17/42/' for category 42 under 17 under root 3
+    path = models.CharField(max_length=255, blank=True, default='')
+
+    objects = CategoryQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'parent'], name='core_category_unique_name_parent'),
+            models.UniqueConstraint(fields=['name'], condition=models.Q(parent__isnull=True),
+                                    name='core_category_unique_root_name'),
+        ]
+        indexes = [
+            models.Index(fields=['path'], name='core_category_path_idx', opclasses=['varchar_pattern_ops']),
+        ]
 
     def __str__(self):
         return self.name
 
+    @property
+    def depth(self):
+        return self.path.count('/') - 1
+
+    def build_path(self):
+        return f'{self.parent.path if self.parent_id else ""}{self.pk}/'
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        old_path, new_path = self.path, self.build_path()
+        if old_path == new_path:
+            return
+        Category.objects.filter(pk=self.pk).update(path=new_path)
+        if old_path:
+            Category.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                path=Concat(Value(new_path), Substr('path', len(old_path) + 1))
+            )
+        self.path = new_path
+
+    def get_descendants(self, include_self=True):
+        descendants = Category.objects.subtree(self)
+        return descendants if include_self else descendants.exclude(pk=self.pk)
+
+    def get_subtree_channels(self):
+        from rssfeeds.models import Channel
+        return Channel.objects.filter(category__in=self.get_descendants()).distinct()
+
+    def subtree_channel_count(self):
+        return self.get_subtree_channels().count()
+
 
 class Type(models.Model):
     name = models.CharField(max_length=50)
@@ -1,24 +1,57 @@
+import hashlib
 import json
-import xml.etree.ElementTree as ET
-from datetime import datetime
+import re
+from datetime import datetime, timezone
 from abc import ABC, abstractmethod
 from .category_node import CategoryNode
+from .date_parser import DateParser
+from .exceptions import MalformedFeed, PermanentError
+from .records import PodcastRecord, NewsRecord
+from .xml_backends import get_backend
 import logging
 
 logger = logging.getLogger('elastic-logger')
 
+ITUNES = '{http://www.itunes.com/dtds/podcast-1.0.dtd}'
+MEDIA = '{http://search.yahoo.com/mrss/}'
+ATOM = '{http://www.w3.org/2005/Atom}'
+XML_LANG = '{http://www.w3.org/XML/1998/namespace}lang'
+
 
 class Parser(ABC):
     """
     Abstract base class for parsing XML data and creating records from it.
 
+    In streaming mode the XML is read incrementally from a file-like object: the channel header is parsed
+    as soon as the first <item> starts, and items are then parsed, yielded and discarded one by one, so
+    memory use does not grow with the number of items.
+
+    Item fields are extracted in a single pass over each <item>'s children: subclasses declare `item_fields`,
+    a table mapping fully qualified (Clark notation) child tags to the field they fill, so no child is
+    looked up by path or namespace prefix per item.
+
+    Items are emitted as compact `record_class` named tuples (see core.records) whose fields are the model
+    fields the item is stored in.
+
     Attributes:
+        channel_tag (str): Tag of the element holding the channel metadata and the items.
+        item_tag (str): Tag of an item element.
+        item_path (str): Path from the channel element to its items, using the `namespaces` prefixes.
+        item_fields (dict): Maps a child tag to (field name, attribute name or None to take its text).
+        record_class (type): The record type of the parsed items.
         itunes_namespace (dict): Namespace for iTunes elements.
         root (Element): The root element of the XML data.
         channel_data (Element): The channel element within the XML data.
+        stream (bool): Whether the XML is parsed incrementally.
+        backend (ElementTreeBackend): The XML engine, see core.xml_backends.
+        date_parser (DateParser): Parses the feed's dates, remembering the format they use.
 
     Methods:
         item_parser(item): Abstract method to parse individual items within the XML.
+        extract_fields(item): Collect the values of all `item_fields` of an item in one pass.
+        iter_items(): Yield the parsed data of every item.
+        build_record(**fields): Create the record of an item, including its content fingerprint.
+        get_fingerprint(item_data): Compute the content fingerprint of a parsed item.
         parse_xml_and_create_records(): Abstract method to parse the entire XML and create records.
         get_element_text(element, tag): Get the text content of a sub-element within an element.
         get_element_attr(element, tag, attr): Get the attribute value of a sub-element within an element.
@@ -26,20 +59,94 @@ class Parser(ABC):
         parse_channel(): Parse the channel data from the XML.
     """
 
-    def __init__(self, xml_data):
+    channel_tag = 'channel'
+    item_tag = 'item'
+    item_path = 'item'
+    item_fields = {}
+    record_class = None
+    itunes_namespace = {'itunes': ITUNES[1:-1]}
+    atom_namespace = {'atom': ATOM[1:-1]}
+    googleplay_namespace = {'googleplay': 'http://www.google.com/schemas/play-podcasts/1.0'}
+    media_namespace = {'media': MEDIA[1:-1]}
+    content_namespace = {'content': 'http://purl.org/rss/1.0/modules/content/'}
+    namespaces = {**itunes_namespace, **atom_namespace, **googleplay_namespace, **media_namespace,
+                  **content_namespace}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._item_defaults = {field: '' for field, _ in cls.item_fields.values()}
+
+    def __init__(self, xml_data, stream=False, backend=None):
         """
         Initialize the Parser with XML data.
 
         Args:
-            xml_data (str): The XML data to parse.
+            xml_data (str, bytes or file-like): The XML data to parse, or a binary file-like object to read
+                it from when `stream` is True.
+            stream (bool, optional): Parse the XML incrementally instead of building the whole tree.
+            backend (ElementTreeBackend, optional): The XML engine; defaults to the FEED_XML_BACKEND one.
+
+        Raises:
+            MalformedFeed: If the XML is not well-formed (in streaming mode also while iterating the items) or
+                has no channel element.
+        """
+        self.stream = stream
+        self.backend = backend or get_backend()
+        self.date_parser = DateParser()
+        self.xml_data = xml_data
+        try:
+            if stream:
+                self.root = self.channel_data = None
+                self._events = self.backend.iterparse(xml_data, events=('start', 'end'))
+                self._read_channel_header()
+            else:
+                self.root = self.backend.fromstring(xml_data)
+                self.channel_data = (self.root if self.root.tag == self.channel_tag
+                                     else self.root.find(self.channel_tag))
+        except self.backend.ParseError as e:
+            raise self.malformed_feed(e) from e
+        if self.channel_data is None:
+            # lxml recovers garbage into a root without a channel instead of raising
+            raise MalformedFeed(f'No <{self.channel_tag}> element found', snippet=get_snippet(xml_data))
+
+    def malformed_feed(self, error):
         """
-        self.itunes_namespace = {'itunes': 'http://www.itunes.com/dtds/podcast-1.0.dtd'}
-        self.atom_namespace = {'atom': 'http://www.w3.org/2005/Atom'}
-        self.googleplay_namespace = {'googleplay': 'http://www.google.com/schemas/play-podcasts/1.0'}
-        self.media_namespace = {'media': 'http://search.yahoo.com/mrss/'}
-        self.content_namespace = {'content': 'http://purl.org/rss/1.0/modules/content/'}
-        self.root = ET.fromstring(xml_data)
-        self.channel_data = self.root.find('channel')
+        Wrap an XML syntax error of the backend in a MalformedFeed carrying the text around the error.
+        """
+        snippet = get_snippet(self.xml_data, getattr(error, 'position', None))
+        return MalformedFeed(f'Malformed XML: {error}', snippet=snippet)
+
+    def _read_channel_header(self):
+        """
+        Consume parse events up to the start of the first <item>, leaving every channel element that precedes
+        the items fully parsed in `channel_data`.
+        """
+        for event, element in self._events:
+            if event != 'start':
+                continue
+            if self.root is None:
+                self.root = element
+            if self.channel_data is None:
+                if element.tag == self.channel_tag:
+                    self.channel_data = element
+            elif element.tag == self.item_tag:
+                return
+        self._events = iter(())
+
+    def _iter_streamed_items(self):
+        depth = 1  # _read_channel_header stopped right after the first <item> started
+        try:
+            for event, element in self._events:
+                if event == 'start':
+                    depth += 1
+                    continue
+                depth -= 1
+                if depth == 0 and element.tag == self.item_tag:
+                    yield element
+                    element.clear()
+                    self.channel_data.remove(element)
+        except self.backend.ParseError as e:
+            raise self.malformed_feed(e) from e
 
     @abstractmethod
     def item_parser(self, item):
@@ -54,6 +161,33 @@ class Parser(ABC):
         """
         pass
 
+    def extract_fields(self, item):
+        """
+        Walk the children of an item once and collect the fields declared in `item_fields`.
+
+        Like Element.find, only the first child with a given tag is used. Fields whose element is missing
+        are returned as an empty string.
+
+        Args:
+            item (Element): The XML element representing an item.
+
+        Returns:
+            dict: Field name to the text or attribute value of its element.
+        """
+        item_fields = self.item_fields
+        fields = self._item_defaults.copy()
+        found = set()
+        for child in item:
+            spec = item_fields.get(child.tag)
+            if spec is None:
+                continue
+            field, attr = spec
+            if field in found:
+                continue
+            found.add(field)
+            fields[field] = child.text if attr is None else child.attrib.get(attr)
+        return fields
+
     def get_categories(self, element, parent=None, parent_list=None):
         """
         Get a hierarchical structure of <itunes:category> elements within an element.
@@ -68,13 +202,13 @@ class Parser(ABC):
         """
         if parent_list is None:
             parent_list = []
-        tag = 'itunes:category'
-        category_elements = element.findall(tag, namespaces=self.itunes_namespace)
+        find_categories = self.backend.compile('itunes:category', self.itunes_namespace)
+        category_elements = find_categories(element)
         for category_element in category_elements:
             name = category_element.attrib.get("text")
             child_category = CategoryNode(name, parent)
             parent_list.append(child_category)
-            if category_element.findall(tag, namespaces=self.itunes_namespace):
+            if find_categories(category_element):
                 self.get_categories(category_element, child_category)
 
         return parent_list
@@ -96,8 +230,7 @@ class Parser(ABC):
         sub_element = element.find(tag, namespaces=namespaces)
         return sub_element.text if sub_element is not None else ''
 
-    @staticmethod
-    def get_element_attr(element, tag, attr):
+    def get_element_attr(self, element, tag, attr, namespaces=None):
         """
         Get the attribute value of a sub-element within an element.
 
@@ -105,11 +238,12 @@ class Parser(ABC):
             element (Element): The parent element.
             tag (str): The tag name of the sub-element.
             attr (str): The name of the attribute.
+            namespaces (dict, optional): Namespace dictionary for the sub-element.
 
         Returns:
             str: The attribute value, or an empty string if not found.
         """
-        sub_element = element.find(tag)
+        sub_element = element.find(tag, namespaces=namespaces or self.itunes_namespace)
         return sub_element.attrib.get(attr) if sub_element is not None else ''
 
     def parse_date(self, date_str):
@@ -117,21 +251,12 @@ class Parser(ABC):
         Parse a date string into a datetime object.
 
         Args:
-            date_str (str): The date string in a specific format.
+            date_str (str): The date string, usually RFC-822 or ISO-8601.
 
         Returns:
-            datetime: A datetime object representing the parsed date, or None if date_str is empty.
-        """
-        if date_str:
-            try:
-                return datetime.strptime(date_str, '%a, %d %b %Y %H:%M:%S %z')
-            except:
-                try:
-                    pub_dat = date_str.replace("T", " ").replace("Z", "")
-                    return datetime.strptime(pub_dat, "%Y-%m-%d %H:%M:%S")
-                except:
-                    return datetime.strptime(date_str, '%a, %d %b %Y %H:%M:%S %Z')
-        return None
+            datetime: A timezone-aware datetime, or None if date_str is empty or not a recognised date.
+        """
+        return self.date_parser.parse(date_str)
 
     def parse_channel(self):
         """
@@ -165,21 +290,73 @@ class Parser(ABC):
             'categories': categories
         }
 
+    def iter_items(self):
+        """
+        Parse the items of the channel one at a time.
+
+        Yields:
+            record_class: The record of each valid item, in document order, including its content fingerprint.
+        """
+        if self.stream:
+            items = self._iter_streamed_items()
+        else:
+            items = self.backend.compile(self.item_path, self.namespaces)(self.channel_data)
+        for item in items:
+            record = self.item_parser(item)
+            if record:
+                yield record
+
+        if self.date_parser.failures:
+            log_data = {'event': 'parser.date',
+                        'message': f"Could not parse {self.date_parser.failures} dates of channel "
+                                   f"{self.get_element_text(self.channel_data, 'title')}."}
+            logger.warning(json.dumps(log_data))
+
+    def build_record(self, **fields):
+        """
+        Create the record of a parsed item.
+
+        Args:
+            **fields: The model fields of the item.
+
+        Returns:
+            record_class: The item's record, including its content fingerprint.
+        """
+        return self.record_class(fingerprint=self.get_fingerprint(fields), **fields)
+
+    @staticmethod
+    def get_fingerprint(item_data):
+        """
+        Compute a stable fingerprint of a parsed item's fields.
+
+        Args:
+            item_data (dict): The model fields of an item.
+
+        Returns:
+            str: Hex SHA-1 digest that changes whenever any field of the item changes.
+        """
+        digest = hashlib.sha1()
+        for key in sorted(item_data):
+            value = item_data[key]
+            digest.update(f'{key}\x1f{value.isoformat() if isinstance(value, datetime) else value}\x1e'.encode())
+        return digest.hexdigest()
+
     def parse_xml_and_create_records(self):
         """
         Parse the entire XML and create records for podcasts.
 
+        In streaming mode the items are returned as a lazy generator in document order; otherwise they are
+        returned as a list sorted by publication date.
+
         Returns:
-            dict: Parsed data including channel data and a list of podcast items.
+            dict: Parsed data including channel data and the podcast items.
         """
         channel_data = self.parse_channel()
-        items = list()
-        for item in self.channel_data.findall('item'):
-            item_data = self.item_parser(item)
-            if item_data:
-                items.append(item_data)
+        if self.stream:
+            return {'channel_data': channel_data, 'podcast_data': self.iter_items()}
 
-        sorted_items = sorted(items, key=lambda x: x['pub_date'] if x['pub_date'] else datetime.min)
+        oldest = datetime.min.replace(tzinfo=timezone.utc)
+        sorted_items = sorted(self.iter_items(), key=lambda x: x.pub_date or oldest)
         return {'channel_data': channel_data, 'podcast_data': sorted_items}
 
 
@@ -187,11 +364,27 @@ class PodcastParser(Parser):
     """
     Parser for podcast XML data.
 
+    Attributes:
+        item_fields (dict): The RSS and iTunes elements of a podcast item.
+
     Methods:
         item_parser(item): Parse an individual podcast item.
         parse_xml_and_create_records(): Parse the entire XML and create records for podcasts.
     """
 
+    item_fields = {
+        'title': ('title', None),
+        f'{ITUNES}subtitle': ('subtitle', None),
+        'description': ('description', None),
+        'guid': ('guid', None),
+        'pubDate': ('pub_date', None),
+        f'{ITUNES}duration': ('duration', None),
+        'enclosure': ('audio_file', 'url'),
+        f'{ITUNES}image': ('image', 'href'),
+        f'{ITUNES}explicit': ('explicit', None),
+    }
+    record_class = PodcastRecord
+
     def item_parser(self, item):
         """
         Parse an individual podcast item.
@@ -200,31 +393,27 @@ class PodcastParser(Parser):
             item (Element): The XML element representing a podcast item.
 
         Returns:
-            dict: Parsed data from the podcast item.
+            PodcastRecord: Parsed data from the podcast item, or None if it has no audio file or guid. An item
+                without a guid is identified by its audio file.
         """
-        title = self.get_element_text(item, 'title')
-        subtitle = self.get_element_text(item, 'itunes:subtitle')
-        description = self.get_element_text(item, 'description')
-        guid = self.get_element_text(item, 'guid')
-        pub_date_str = self.get_element_text(item, 'pubDate')
-        pub_date = self.parse_date(pub_date_str)
-        duration = self.get_element_text(item, 'itunes:duration')
-        audio_file = self.get_element_attr(item, 'enclosure', 'url')
-        image = self.get_element_attr(item, 'itunes:image', 'href')
-        explicit = True if (self.get_element_text(item, 'itunes:explicit')).lower() in ('yes' or 'true') else False
+        fields = self.extract_fields(item)
+        title = fields['title']
+        guid = fields['guid']
+        audio_file = fields['audio_file']
+        explicit = (fields['explicit'] or '').strip().lower() in ('yes', 'true')
 
         if audio_file or guid:
-            return {
-                'title': title,
-                'subtitle': subtitle,
-                'description': description,
-                'guid': guid,
-                'pub_date': pub_date,
-                'duration': duration,
-                'audio_file': audio_file,
-                'image': image,
-                'explicit': explicit
-            }
+            return self.build_record(
+                title=title,
+                subtitle=fields['subtitle'],
+                description=fields['description'],
+                guid=guid or audio_file,
+                pub_date=self.parse_date(fields['pub_date']),
+                duration=fields['duration'],
+                audio_file=audio_file,
+                image=fields['image'],
+                explicit=explicit
+            )
         else:
             log_data = {'event': f'parser.podcast.{title}',
                         'message': f"Missing audio_file, or guid for Podcast {title}."}
@@ -236,11 +425,24 @@ class NewsParser(Parser):
     """
     Parser for News XML data.
 
+    Attributes:
+        item_fields (dict): The RSS and Media RSS elements of a News item.
+
     Methods:
         item_parser(item): Parse an individual News item.
         parse_xml_and_create_records(): Parse the entire XML and create records for News.
     """
 
+    item_fields = {
+        'title': ('title', None),
+        'link': ('link', None),
+        'guid': ('guid', None),
+        'pubDate': ('pub_date', None),
+        'source': ('source', 'url'),
+        f'{MEDIA}content': ('image', None),
+    }
+    record_class = NewsRecord
+
     def item_parser(self, item):
         """
         Parse an individual News item.
@@ -249,27 +451,283 @@ class NewsParser(Parser):
             item (Element): The XML element representing a News item.
 
         Returns:
-            dict: Parsed data from the News item.
+            NewsRecord: Parsed data from the News item, or None if it has no guid.
         """
-        title = self.get_element_text(item, 'title')
-        link = self.get_element_text(item, 'link')
-        guid = self.get_element_text(item, 'guid')
-        pub_date_str = self.get_element_text(item, 'pubDate')
-        pub_date = self.parse_date(pub_date_str)
-        source = self.get_element_attr(item, 'source', 'url')
-        image = self.get_element_text(item, 'media:content', namespaces=self.media_namespace)
+        fields = self.extract_fields(item)
+        title = fields['title']
+        guid = fields['guid']
 
         if guid:
-            return {
-                'title': title,
-                'link': link,
-                'guid': guid,
-                'pub_date': pub_date,
-                'image': image,
-                'source': source
-            }
+            return self.build_record(
+                title=title,
+                link=fields['link'],
+                guid=guid,
+                pub_date=self.parse_date(fields['pub_date']),
+                image=fields['image'],
+                source=fields['source']
+            )
         else:
             log_data = {'event': f'parser.news.{title}',
                         'message': f"Missing audio_file, or guid for News {title}."}
             logger.warning(json.dumps(log_data))
             return None
+
+
+class AtomParser(Parser):
+    """
+    Base parser for Atom 1.0 feeds.
+
+    The <feed> root plays the role of the RSS <channel> and its <entry> elements that of the items; channel
+    and item records have the same shape as those of the RSS parsers.
+
+    Methods:
+        parse_channel(): Parse the feed metadata into RSS channel fields.
+        get_link(entry, rel): Get the href of an entry's <link> with the given relation.
+    """
+    channel_tag = f'{ATOM}feed'
+    item_tag = f'{ATOM}entry'
+    item_path = 'atom:entry'
+
+    def parse_channel(self):
+        """
+        Parse the feed metadata from the XML.
+
+        Returns:
+            dict: Parsed channel data, with <atom:category> terms as top-level categories.
+        """
+        feed = self.channel_data
+        title = self.get_element_text(feed, 'atom:title', self.atom_namespace) or ''
+        subtitle = self.get_element_text(feed, 'atom:subtitle', self.atom_namespace) or ''
+        updated = self.parse_date(self.get_element_text(feed, 'atom:updated', self.atom_namespace))
+        image = (self.get_element_attr(feed, 'itunes:image', 'href')
+                 or self.get_element_text(feed, 'atom:logo', self.atom_namespace)
+                 or self.get_element_text(feed, 'atom:icon', self.atom_namespace))
+        author = self.get_element_text(feed, 'atom:author/atom:name', self.atom_namespace) or ''
+        categories = [
+            CategoryNode(category.attrib.get('label') or category.attrib.get('term'))
+            for category in self.backend.compile('atom:category', self.atom_namespace)(feed)
+        ]
+        return {
+            'data':
+                {'title': title,
+                 'description': subtitle,
+                 'last_update': updated,
+                 'language': feed.attrib.get(XML_LANG, ''),
+                 'subtitle': subtitle,
+                 'image': image,
+                 'author': author,
+                 'owner': author, },
+            'categories': categories
+        }
+
+    def get_link(self, entry, rel='alternate'):
+        """
+        Get the href of the first <atom:link> of an entry with the given relation.
+
+        Args:
+            entry (Element): The XML element representing an entry.
+            rel (str, optional): The link relation; links without a rel attribute are 'alternate'.
+
+        Returns:
+            str: The link target, or an empty string if the entry has no such link.
+        """
+        for link in self.backend.compile('atom:link', self.atom_namespace)(entry):
+            if link.attrib.get('rel', 'alternate') == rel:
+                return link.attrib.get('href', '')
+        return ''
+
+
+class AtomPodcastParser(AtomParser):
+    """
+    Parser for podcast Atom data; the audio file is the entry's rel="enclosure" link.
+
+    Attributes:
+        item_fields (dict): The Atom and iTunes elements of a podcast entry.
+    """
+
+    item_fields = {
+        f'{ATOM}title': ('title', None),
+        f'{ITUNES}subtitle': ('subtitle', None),
+        f'{ATOM}summary': ('description', None),
+        f'{ATOM}id': ('guid', None),
+        f'{ATOM}published': ('published', None),
+        f'{ATOM}updated': ('updated', None),
+        f'{ITUNES}duration': ('duration', None),
+        f'{ITUNES}image': ('image', 'href'),
+        f'{ITUNES}explicit': ('explicit', None),
+    }
+    record_class = PodcastRecord
+
+    def item_parser(self, item):
+        """
+        Parse an individual podcast entry.
+
+        Args:
+            item (Element): The XML element representing a podcast entry.
+
+        Returns:
+            PodcastRecord: Parsed data from the podcast entry, or None if it has no audio file or id.
+        """
+        fields = self.extract_fields(item)
+        title = fields['title'] or ''
+        guid = fields['guid']
+        audio_file = self.get_link(item, 'enclosure')
+
+        if audio_file or guid:
+            return self.build_record(
+                title=title,
+                subtitle=fields['subtitle'],
+                description=fields['description'],
+                guid=guid or audio_file,
+                pub_date=self.parse_date(fields['published'] or fields['updated']),
+                duration=fields['duration'],
+                audio_file=audio_file,
+                image=fields['image'],
+                explicit=(fields['explicit'] or '').strip().lower() in ('yes', 'true')
+            )
+        else:
+            log_data = {'event': f'parser.podcast.{title}',
+                        'message': f"Missing audio_file, or guid for Podcast {title}."}
+            logger.warning(json.dumps(log_data))
+            return None
+
+
+class AtomNewsParser(AtomParser):
+    """
+    Parser for News Atom data.
+
+    Attributes:
+        item_fields (dict): The Atom and Media RSS elements of a News entry.
+    """
+
+    item_fields = {
+        f'{ATOM}title': ('title', None),
+        f'{ATOM}id': ('guid', None),
+        f'{ATOM}published': ('published', None),
+        f'{ATOM}updated': ('updated', None),
+        f'{MEDIA}thumbnail': ('image', 'url'),
+    }
+    record_class = NewsRecord
+
+    def item_parser(self, item):
+        """
+        Parse an individual News entry.
+
+        Args:
+            item (Element): The XML element representing a News entry.
+
+        Returns:
+            NewsRecord: Parsed data from the News entry, or None if it has no id.
+        """
+        fields = self.extract_fields(item)
+        title = fields['title'] or ''
+        guid = fields['guid']
+
+        if guid:
+            return self.build_record(
+                title=title,
+                link=self.get_link(item),
+                guid=guid,
+                pub_date=self.parse_date(fields['published'] or fields['updated']),
+                image=fields['image'],
+                source=''
+            )
+        else:
+            log_data = {'event': f'parser.news.{title}',
+                        'message': f"Missing guid for News {title}."}
+            logger.warning(json.dumps(log_data))
+            return None
+
+
+class UnsupportedFeedFormat(PermanentError, ValueError):
+    """
+    Raised when a feed body is not in a format any registered parser understands.
+
+    Attributes:
+        feed_format (str or None): The sniffed format, e.g. 'rdf', or None if no root element was found.
+    """
+
+    def __init__(self, feed_format, snippet=''):
+        self.feed_format = feed_format
+        super().__init__(f'Unsupported feed format: {feed_format or "not XML"}', snippet=snippet)
+
+    def __reduce__(self):
+        return type(self), (self.feed_format, self.snippet)
+
+
+PARSER_REGISTRY = {
+    'rss': {'podcast': PodcastParser, 'news': NewsParser},
+    'atom': {'podcast': AtomPodcastParser, 'news': AtomNewsParser},
+}
+
+SNIFF_BYTES = 8192
+XML_COMMENT_RE = re.compile(rb'<!--.*?(?:-->|$)', re.DOTALL)
+ROOT_TAG_RE = re.compile(rb'<([A-Za-z_][\w.-]*:)?([A-Za-z_][\w.-]*)')
+
+
+def sniff_feed_format(xml_data):
+    """
+    Detect a feed's format from the root element in its first bytes, without parsing the document.
+
+    Args:
+        xml_data (bytes or str): The feed body, or at least its beginning.
+
+    Returns:
+        str: 'rss', 'atom' (1.0), 'rdf' (RSS 1.0), the local name of any other root element, or None if no
+            element was found.
+    """
+    head = xml_data[:SNIFF_BYTES]
+    if isinstance(head, str):
+        head = head.encode('utf-8', 'ignore')
+    elif head.startswith((b'\xff\xfe', b'\xfe\xff')):
+        head = head.decode('utf-16', 'ignore').encode('utf-8', 'ignore')
+    head = XML_COMMENT_RE.sub(b'', head)
+
+    match = ROOT_TAG_RE.search(head)
+    if match is None:
+        return None
+    root = match.group(2).decode()
+    if root == 'feed':
+        return 'atom' if ATOM[1:-1].encode() in head else 'atom0.3'
+    return root.lower()
+
+
+def get_parser_class(xml_data, rss_type):
+    """
+    Pick the parser for a feed body from the sniffed format and the feed's type (podcast or news).
+
+    Raises:
+        UnsupportedFeedFormat: If no parser reads the sniffed format.
+    """
+    feed_format = sniff_feed_format(xml_data)
+    if feed_format not in PARSER_REGISTRY:
+        raise UnsupportedFeedFormat(feed_format, snippet=get_snippet(xml_data))
+    return PARSER_REGISTRY[feed_format][rss_type.lower()]
+
+
+def get_snippet(xml_data, position=None, length=500):
+    """
+    Return the text of a feed body around a (line, column) position, or its beginning without one.
+
+    Args:
+        xml_data (str, bytes or file-like): The feed body; of file-like objects only in-memory ones are read.
+        position (tuple, optional): 1-based line and 0-based column, as reported by the XML backends.
+        length (int, optional): Maximum length of the snippet.
+
+    Returns:
+        str: The snippet, or an empty string if the body cannot be read again.
+    """
+    if hasattr(xml_data, 'getvalue'):
+        xml_data = xml_data.getvalue()
+    if isinstance(xml_data, bytes):
+        xml_data = xml_data.decode('utf-8', 'replace')
+    if not isinstance(xml_data, str):
+        return ''
+    if not position:
+        return xml_data[:length]
+
+    line, column = position
+    lines = xml_data.splitlines()
+    text = lines[line - 1] if 0 < line <= len(lines) else ''
+    start = max(0, column - length // 2)
+    return text[start:start + length]
@@ -0,0 +1,28 @@
+from collections import namedtuple
+
+# Field schema of parsed items. Names match the model fields of rssfeeds.models.AbstractBase and its
+# subclasses, so a record maps directly onto a model instance.
+ITEM_FIELDS = ('title', 'guid', 'pub_date', 'image')
+PODCAST_FIELDS = ITEM_FIELDS + ('subtitle', 'description', 'duration', 'audio_file', 'explicit')
+NEWS_FIELDS = ITEM_FIELDS + ('link', 'source')
+
+
+class ItemRecord:
+    """
+    Mixin for the compact, immutable records parsers emit for feed items.
+
+    Records are named tuples, so a 20k-item feed costs one small tuple per item instead of a dict. The
+    content fingerprint is carried alongside the model fields.
+    """
+    __slots__ = ()
+
+    def as_model_kwargs(self):
+        return self._asdict()
+
+
+class PodcastRecord(ItemRecord, namedtuple('PodcastRecord', PODCAST_FIELDS + ('fingerprint',), defaults=(None,))):
+    __slots__ = ()
+
+
+class NewsRecord(ItemRecord, namedtuple('NewsRecord', NEWS_FIELDS + ('fingerprint',), defaults=(None,))):
+    __slots__ = ()
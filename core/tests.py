@@ -1,3 +1,163 @@
-from django.test import TestCase
+import io
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase
+
+from .category_node import CategoryNode
+from .category_resolver import CategoryResolver
+from .date_parser import DateParser
+from .exceptions import MalformedFeed
+from .models import Category
+from .parsers import PodcastParser, get_parser_class
+from .xml_backends import ElementTreeBackend, LxmlBackend, lxml_etree
+
+CORPUS_DIR = Path(__file__).resolve().parent / 'test_feeds'
+
+BACKENDS = [ElementTreeBackend()] + ([LxmlBackend()] if lxml_etree else [])
+
+
+class FeedCorpusTests(SimpleTestCase):
+    """
+    Parses the feed corpus in core/test_feeds with every available XML backend.
+    """
+
+    # Items each well-formed corpus feed yields with the parser of its type
+    expected_items = {
+        ('podcast.xml', 'podcast'): ['corpus-3', 'corpus-2', 'https://example.com/1.mp3'],
+        ('news.xml', 'news'): ['https://news.example.com/markets', 'breaking-1'],
+        ('atom_podcast.xml', 'podcast'): ['urn:uuid:episode-2', 'urn:uuid:episode-1'],
+        ('atom_news.xml', 'news'): ['tag:news.example.com,2023:1'],
+    }
+
+    def test_items(self):
+        for (name, rss_type), guids in self.expected_items.items():
+            xml_data = (CORPUS_DIR / name).read_bytes()
+            parser_class = get_parser_class(xml_data, rss_type)
+            for backend in BACKENDS:
+                for stream in (False, True):
+                    with self.subTest(feed=name, backend=backend.name, stream=stream):
+                        source = io.BytesIO(xml_data) if stream else xml_data
+                        parser = parser_class(source, stream=stream, backend=backend)
+                        self.assertTrue(parser.parse_channel()['data']['title'])
+                        self.assertEqual([item.guid for item in parser.iter_items()], guids)
+
+    def test_garbage_is_malformed(self):
+        # lxml's recover mode turns garbage into a root without a channel instead of raising
+        for backend in BACKENDS:
+            for stream in (False, True):
+                with self.subTest(backend=backend.name, stream=stream), self.assertRaises(MalformedFeed):
+                    xml_data = b'<rss>\x00\x01 lol'
+                    PodcastParser(io.BytesIO(xml_data) if stream else xml_data, stream=stream, backend=backend)
+
+    @skipUnless(lxml_etree, 'lxml is not installed')
+    def test_backends_agree(self):
+        stdout = io.StringIO()
+        call_command('compare_xml_backends', str(CORPUS_DIR), stdout=stdout)
+        self.assertIn(' 0 mismatches', stdout.getvalue())
+
+
+class DateParserTests(SimpleTestCase):
+    """
+    Parses the date layouts feeds use into timezone-aware datetimes.
+    """
+
+    def assertParses(self, value, expected):
+        parsed = DateParser().parse(value)
+        self.assertEqual(parsed, expected)
+        self.assertEqual(parsed.utcoffset(), expected.utcoffset())
+
+    def test_rfc822(self):
+        cases = [
+            ('Mon, 01 Jan 2024 10:00:00 +0000', datetime(2024, 1, 1, 10, tzinfo=timezone.utc)),
+            ('Mon, 01 Jan 2024 10:00:00 +0330', datetime(2024, 1, 1, 10, tzinfo=timezone(timedelta(hours=3.5)))),
+            ('Tue, 2 Jan 2024 10:00:00 EST', datetime(2024, 1, 2, 10, tzinfo=timezone(timedelta(hours=-5)))),
+            ('Tue, 2 Jan 2024 10:00:00 GMT', datetime(2024, 1, 2, 10, tzinfo=timezone.utc)),
+            ('2 January 2024 10:00 PDT', datetime(2024, 1, 2, 10, tzinfo=timezone(timedelta(hours=-7)))),
+            ('Tue, 2 Jan 24 10:00:00 XYZ', datetime(2024, 1, 2, 10, tzinfo=timezone.utc)),  # unknown zones are UTC
+        ]
+        for value, expected in cases:
+            with self.subTest(value=value):
+                self.assertParses(value, expected)
+
+    def test_iso8601(self):
+        cases = [
+            ('2024-01-03T10:00:00Z', datetime(2024, 1, 3, 10, tzinfo=timezone.utc)),
+            ('2024-01-03T10:00:00+03:30', datetime(2024, 1, 3, 10, tzinfo=timezone(timedelta(hours=3.5)))),
+            ('2024-01-03T10:00:00.25-0500', datetime(2024, 1, 3, 10, 0, 0, 250000,
+                                                     tzinfo=timezone(timedelta(hours=-5)))),
+            ('2024-01-03 10:00:00', datetime(2024, 1, 3, 10, tzinfo=timezone.utc)),
+            ('2024-01-03', datetime(2024, 1, 3, tzinfo=timezone.utc)),
+        ]
+        for value, expected in cases:
+            with self.subTest(value=value):
+                self.assertParses(value, expected)
+
+    def test_fallback_format_is_remembered(self):
+        date_parser = DateParser()
+        self.assertEqual(date_parser.parse('01/05/2024 10:00:00'), datetime(2024, 1, 5, 10, tzinfo=timezone.utc))
+        self.assertEqual(date_parser.parser.__name__, '%m/%d/%Y %H:%M:%S')
+        # The next date of the feed is parsed by the remembered format alone
+        with mock.patch('core.date_parser.PARSERS', ()):
+            self.assertEqual(date_parser.parse('01/06/2024 11:30:00'),
+                             datetime(2024, 1, 6, 11, 30, tzinfo=timezone.utc))
+        self.assertEqual(date_parser.parsed, 2)
+
+    def test_unparseable(self):
+        date_parser = DateParser()
+        self.assertIsNone(date_parser.parse('not a date'))
+        self.assertIsNone(date_parser.parse('Mon, 32 Jan 2024 10:00:00 +0000'))
+        self.assertIsNone(date_parser.parse(''))
+        self.assertIsNone(date_parser.parse(None))
+        self.assertEqual((date_parser.parsed, date_parser.failures), (0, 2))
+
+
+def category_tree(name, *children):
+    """
+    Build a CategoryNode with the given child category names.
+    """
+    node = CategoryNode(name)
+    for child in children:
+        CategoryNode(child, node)
+    return node
+
+
+class CategoryResolverTests(TestCase):
+    """
+    Resolves feed category trees, inside transactions like the persist stages do.
+    """
+
+    def setUp(self):
+        self.resolver = CategoryResolver()
+
+    def test_resolve(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            arts_id, design_id = self.resolver.resolve([category_tree('Arts', 'Design')])
+        design = Category.objects.get(pk=design_id)
+        self.assertEqual((design.name, design.parent_id, design.path), ('Design', arts_id, f'{arts_id}/{design_id}/'))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.resolver.resolve([category_tree('Arts', 'Design')]), [arts_id, design_id])
+
+    def test_rollback_leaves_cache_unchanged(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.resolver.resolve([category_tree('Arts')])
+            raise RuntimeError('deadlock')
+        self.assertFalse(Category.objects.exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            arts_id, design_id = self.resolver.resolve([category_tree('Arts', 'Design')])
+        self.assertEqual(Category.objects.get(pk=design_id).parent_id, arts_id)
+        self.assertTrue(Category.objects.filter(pk=arts_id, name='Arts').exists())
+
+    def test_child_of_category_without_path(self):
+        # Categories that predate the materialized paths have none until rebuild_category_paths runs
+        arts = Category.objects.create(name='Arts')
+        Category.objects.filter(pk=arts.pk).update(path='')
+        with self.captureOnCommitCallbacks(execute=True):
+            arts_id, design_id = self.resolver.resolve([category_tree('Arts', 'Design')])
+        self.assertEqual(arts_id, arts.pk)
+        self.assertEqual(Category.objects.get(pk=design_id).path, f'{arts_id}/{design_id}/')
+        self.assertEqual(Category.objects.get(pk=arts_id).path, f'{arts_id}/')
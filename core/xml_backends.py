@@ -0,0 +1,99 @@
+import xml.etree.ElementTree as ET
+
+from django.conf import settings
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+
+
+class ElementTreeBackend:
+    """
+    XML engine built on the standard library's xml.etree.ElementTree.
+
+    Both backends expose the same small interface to the feed parsers and return elements with the
+    ElementTree API (tag, text, attrib, find, iteration over children), so parsers work unchanged on either.
+
+    Methods:
+        fromstring(xml_data): Parse a whole document and return its root element.
+        iterparse(source, events): Parse a binary file-like object incrementally.
+        compile(path, namespaces): Return a callable that finds all sub-elements matching a path.
+    """
+    name = 'etree'
+    ParseError = ET.ParseError
+
+    def __init__(self):
+        self._compiled = {}
+
+    def fromstring(self, xml_data):
+        return ET.fromstring(xml_data)
+
+    def iterparse(self, source, events):
+        return ET.iterparse(source, events=events)
+
+    def compile(self, path, namespaces=None):
+        key = (path, tuple(sorted(namespaces.items())) if namespaces else ())
+        finder = self._compiled.get(key)
+        if finder is None:
+            finder = self._compiled[key] = self._compile(path, namespaces)
+        return finder
+
+    @staticmethod
+    def _compile(path, namespaces):
+        return lambda element: element.findall(path, namespaces)
+
+
+class LxmlBackend(ElementTreeBackend):
+    """
+    XML engine built on lxml's C parser.
+
+    Lookups are compiled to XPath objects once per path. The parser runs with recover=True, so feeds with
+    minor well-formedness errors (stray '&', unclosed tags) are still read. Entity resolution and network
+    access are disabled.
+    """
+    name = 'lxml'
+    ParseError = lxml_etree.XMLSyntaxError if lxml_etree else None
+    parser_options = {'recover': True, 'resolve_entities': False, 'no_network': True, 'huge_tree': True,
+                      'remove_comments': True, 'remove_pis': True}
+
+    def fromstring(self, xml_data):
+        if isinstance(xml_data, str):
+            xml_data = xml_data.encode()
+        # lxml parser objects must not be shared between threads
+        root = lxml_etree.fromstring(xml_data, lxml_etree.XMLParser(**self.parser_options))
+        if root is None:
+            # Nothing was recoverable; parse strictly to raise an XMLSyntaxError describing the problem
+            root = lxml_etree.fromstring(xml_data, lxml_etree.XMLParser(resolve_entities=False, no_network=True))
+        return root
+
+    def iterparse(self, source, events):
+        return lxml_etree.iterparse(source, events=events, **self.parser_options)
+
+    @staticmethod
+    def _compile(path, namespaces):
+        return lxml_etree.XPath(path, namespaces=namespaces)
+
+
+_backends = {}
+
+
+def get_backend(name=None):
+    """
+    Return the XML backend selected by FEED_XML_BACKEND, or by `name`.
+
+    'lxml' falls back to the ElementTree backend when lxml is not installed.
+
+    Args:
+        name (str, optional): 'lxml' or 'etree'.
+
+    Returns:
+        ElementTreeBackend: A shared backend instance.
+    """
+    name = name or getattr(settings, 'FEED_XML_BACKEND', ElementTreeBackend.name)
+    if name == LxmlBackend.name and lxml_etree is None:
+        name = ElementTreeBackend.name
+    if name not in _backends:
+        backend_class = {LxmlBackend.name: LxmlBackend, ElementTreeBackend.name: ElementTreeBackend}[name]
+        _backends[name] = backend_class()
+    return _backends[name]
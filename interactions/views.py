@@ -13,7 +13,6 @@ from .mixins import InteractionMixin
 from .models import Like, Comment, BookMark, Subscription, Recommendation
 from .utils import update_recommendations
 from .serializers import SubscriptionSerializer
-from rssfeeds.models import Channel
 from rssfeeds.serializers import ChannelSerializer
 
 
@@ -92,7 +91,7 @@ class RecommendationRetrieveView(APIView):
 
         if recommendations.exists():
             recommendation = recommendations.first()
-            channels = Channel.objects.filter(category=recommendation.category)[:5]
+            channels = recommendation.category.get_subtree_channels()[:5]
             serializer = ChannelSerializer(channels, many=True, context={'request': request})
             return Response(serializer.data, status=status.HTTP_200_OK)
         else:
@@ -1,9 +1,36 @@
 from django.contrib import admin
+from .health import release
 from .models import Channel, Podcast, News, XmlLink
 # Register your models here.
 
 
-admin.site.register(XmlLink)
+class QuarantinedFilter(admin.SimpleListFilter):
+    title = 'quarantined'
+    parameter_name = 'quarantined'
+
+    def lookups(self, request, model_admin):
+        return [('yes', 'Yes'), ('no', 'No')]
+
+    def queryset(self, request, queryset):
+        if self.value() in ('yes', 'no'):
+            return queryset.filter(quarantined_at__isnull=self.value() == 'no')
+        return queryset
+
+
+@admin.register(XmlLink)
+class XmlLinkAdmin(admin.ModelAdmin):
+    list_display = ['xml_link', 'rss_type', 'consecutive_failures', 'last_success_at', 'last_error_at',
+                    'quarantined_at', 'avg_fetch_seconds', 'avg_fetch_bytes', 'next_fetch_at']
+    list_filter = [QuarantinedFilter, 'rss_type']
+    search_fields = ['xml_link', 'last_error']
+    ordering = ['-consecutive_failures']
+    readonly_fields = ['consecutive_failures', 'last_success_at', 'last_error', 'last_error_snippet',
+                       'last_error_at', 'avg_fetch_seconds', 'avg_fetch_bytes', 'quarantined_at']
+    actions = ['release_feeds']
+
+    @admin.action(description='Release from quarantine and fetch again')
+    def release_feeds(self, request, queryset):
+        self.message_user(request, f'{release(queryset)} feeds released.')
 admin.site.register(News)
 admin.site.register(Channel)
 
@@ -0,0 +1,185 @@
+import json
+import logging
+import mmap
+import os
+import socket
+import struct
+import threading
+import time
+import uuid
+import zlib
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from core.exceptions import PermanentError
+from .models import ArchivedFeed
+
+logger = logging.getLogger('elastic-logger')
+
+# Record header: magic, XmlLink id, compressed length, raw size, CRC-32 of the compressed body
+RECORD_HEADER = struct.Struct('>4sQIII')
+RECORD_MAGIC = b'FAR1'
+# Segments without index entries are only deleted once nobody has written to them for this many seconds
+PRUNE_GRACE_SECONDS = 3600
+
+
+class CorruptArchive(PermanentError):
+    """
+    Raised when an archived record does not match its index entry or fails its checksum.
+    """
+
+
+class FeedArchive:
+    """
+    Append-only archive of raw feed bodies on local disk.
+
+    Bodies are zlib-compressed and appended to segment files in FEED_ARCHIVE_DIR; each record is indexed by
+    an ArchivedFeed row holding its XmlLink, fetch time, segment and offset. Every process writes its own
+    segment, so writers never share a file, and a segment is closed for good once it reaches
+    FEED_ARCHIVE_SEGMENT_SIZE. Records carry their XmlLink id and a checksum, so a segment can be verified
+    without the database.
+
+    Reads memory-map the segments, so replaying many bodies from one segment costs no read() calls and
+    the pages are shared with the OS cache.
+
+    Old bodies are dropped by prune(), which deletes their index entries and then every segment file no
+    entry points to any more.
+
+    Methods:
+        append(xml_link, content, content_hash): Archive a feed body and return its index entry.
+        read(entry): Return the body of an index entry.
+        prune(keep): Keep only the `keep` latest bodies of every feed.
+        close(): Close the open segment and the mappings.
+    """
+
+    def __init__(self, directory=None, segment_size=None):
+        self.directory = directory or settings.FEED_ARCHIVE_DIR
+        self.segment_size = segment_size or settings.FEED_ARCHIVE_SEGMENT_SIZE
+        self._lock = threading.Lock()
+        self._segment = None
+        self._file = None
+        self._pid = None
+        self._maps = {}
+
+    def new_segment_name(self):
+        return f'{timezone.now():%Y%m%d%H%M%S}-{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}.seg'
+
+    def get_segment(self):
+        # A segment inherited across fork belongs to the parent; a full or pruned segment is never reopened
+        if (self._file is None or self._pid != os.getpid() or self._file.tell() >= self.segment_size
+                or os.fstat(self._file.fileno()).st_nlink == 0):
+            if self._file is not None and self._pid == os.getpid():
+                self._file.close()
+            os.makedirs(self.directory, exist_ok=True)
+            self._segment = self.new_segment_name()
+            self._file = open(os.path.join(self.directory, self._segment), 'ab')
+            self._pid = os.getpid()
+        return self._segment, self._file
+
+    def append(self, xml_link, content, content_hash):
+        data = zlib.compress(content, 6)
+        header = RECORD_HEADER.pack(RECORD_MAGIC, xml_link.id, len(data), len(content), zlib.crc32(data))
+        with self._lock:
+            segment, file = self.get_segment()
+            offset = file.tell()
+            file.write(header + data)
+            file.flush()
+        return ArchivedFeed.objects.create(xml_link=xml_link, segment=segment, offset=offset, length=len(data),
+                                           size=len(content), content_hash=content_hash)
+
+    def get_map(self, segment, end):
+        # The segment being written keeps growing, so a mapping that ends before the record is renewed
+        segment_map = self._maps.get(segment)
+        if segment_map is None or len(segment_map) < end:
+            if segment_map is not None:
+                segment_map.close()
+            with open(os.path.join(self.directory, segment), 'rb') as file:
+                segment_map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[segment] = segment_map
+        return segment_map
+
+    def read(self, entry):
+        end = entry.offset + RECORD_HEADER.size + entry.length
+        segment_map = self.get_map(entry.segment, end)
+        magic, xml_link_id, length, size, crc = RECORD_HEADER.unpack_from(segment_map, entry.offset)
+        if magic != RECORD_MAGIC or xml_link_id != entry.xml_link_id or length != entry.length:
+            raise CorruptArchive(f'Archived feed {entry.pk} does not match the record in {entry.segment}')
+        data = segment_map[entry.offset + RECORD_HEADER.size:end]
+        if zlib.crc32(data) != crc:
+            raise CorruptArchive(f'Archived feed {entry.pk} failed its checksum')
+        return zlib.decompress(data, bufsize=size or zlib.DEF_BUF_SIZE)
+
+    def prune(self, keep):
+        """
+        Drop all but the `keep` latest archived bodies of every feed, then delete the segment files that no
+        index entry points to and that have not been written to for PRUNE_GRACE_SECONDS.
+
+        Returns:
+            tuple: (number of deleted index entries, number of deleted segment files).
+        """
+        stale_ids = list(
+            ArchivedFeed.objects
+            .annotate(version=Window(RowNumber(), partition_by=[F('xml_link_id')],
+                                     order_by=[F('fetched_at').desc(), F('id').desc()]))
+            .filter(version__gt=keep)
+            .values_list('id', flat=True)
+        )
+        deleted_entries = 0
+        for i in range(0, len(stale_ids), 1000):
+            deleted_entries += ArchivedFeed.objects.filter(id__in=stale_ids[i:i + 1000]).delete()[0]
+
+        live_segments = set(ArchivedFeed.objects.values_list('segment', flat=True).distinct())
+        cutoff = time.time() - PRUNE_GRACE_SECONDS
+        deleted_segments = 0
+        for path in Path(self.directory).glob('*.seg'):
+            if path.name in live_segments or path.stat().st_mtime >= cutoff:
+                continue
+            segment_map = self._maps.pop(path.name, None)
+            if segment_map is not None:
+                segment_map.close()
+            path.unlink(missing_ok=True)
+            deleted_segments += 1
+        return deleted_entries, deleted_segments
+
+    def close(self):
+        with self._lock:
+            if self._file is not None and self._pid == os.getpid():
+                self._file.close()
+            self._file = self._segment = None
+        for segment_map in self._maps.values():
+            segment_map.close()
+        self._maps.clear()
+
+
+_feed_archive = None
+
+
+def get_feed_archive():
+    global _feed_archive
+    if _feed_archive is None:
+        _feed_archive = FeedArchive()
+    return _feed_archive
+
+
+def archive_feed(xml_link, content, content_hash):
+    """
+    Archive a newly fetched feed body if the archive is enabled.
+
+    The archive is a convenience for replays, so failing to write it is logged and never fails the ingest.
+
+    Returns:
+        ArchivedFeed: The index entry of the body, or None if it was not archived.
+    """
+    if not settings.FEED_ARCHIVE_ENABLED:
+        return None
+    try:
+        return get_feed_archive().append(xml_link, content, content_hash)
+    except OSError as e:
+        log_data = {'event': 'feed_archive.append',
+                    'message': f'Could not archive the body of XML link {xml_link.xml_link}: {e}'}
+        logger.warning(json.dumps(log_data))
+        return None
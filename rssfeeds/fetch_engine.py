@@ -0,0 +1,86 @@
+import asyncio
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+import aiohttp
+from django.conf import settings
+
+from core.exceptions import PermanentError, TransientError, http_error
+from .http_client import ACCEPT_ENCODING, CHUNK_SIZE, BodyReader, FetchResult
+from .rate_limit import get_rate_limiter
+from .utils import get_conditional_headers
+
+
+class BatchFetcher:
+    """
+    Download many feeds concurrently from a single worker using asyncio.
+
+    Concurrency is bounded globally and per host by the aiohttp connector, which also keeps connections
+    alive so feeds sharing a host reuse them. Each request first waits for its host's rate-limit token and
+    is subject to a total timeout; its body is streamed through a BodyReader, which aborts oversized and
+    non-XML responses early. Failures are captured on the returned FetchResult instead of being raised, so
+    one broken feed never aborts the rest of the batch.
+
+    Attributes:
+        concurrency (int): Maximum number of requests in flight.
+        per_host_concurrency (int): Maximum number of requests in flight to the same host.
+        timeout (float): Total timeout in seconds for a single feed download.
+        connections (Counter): Number of 'created' and 'reused' connections during the last run.
+
+    Methods:
+        run(xml_links): Fetch the given XmlLinks and return their FetchResults in the same order.
+        fetch_all(xml_links): Coroutine version of run().
+    """
+
+    def __init__(self, concurrency=None, per_host_concurrency=None, timeout=None):
+        self.concurrency = concurrency or settings.FEED_FETCH_CONCURRENCY
+        self.per_host_concurrency = per_host_concurrency or settings.FEED_FETCH_PER_HOST_CONCURRENCY
+        self.timeout = timeout or settings.FEED_FETCH_TIMEOUT
+        self.connections = Counter()
+
+    def run(self, xml_links):
+        return asyncio.run(self.fetch_all(xml_links))
+
+    async def fetch_all(self, xml_links):
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host_concurrency)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        headers = {'Accept-Encoding': ACCEPT_ENCODING}
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers,
+                                         trace_configs=[self.get_trace_config()]) as session:
+            return await asyncio.gather(*(self.fetch(session, xml_link) for xml_link in xml_links))
+
+    def get_trace_config(self):
+        async def on_connection_create_end(session, context, params):
+            self.connections['created'] += 1
+
+        async def on_connection_reuseconn(session, context, params):
+            self.connections['reused'] += 1
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace_config
+
+    async def fetch(self, session, xml_link):
+        url = xml_link.xml_link
+        host = urlsplit(url).netloc
+        rate_limiter = get_rate_limiter()
+        start = time.monotonic()
+        try:
+            await rate_limiter.acquire_async(host)
+            async with session.get(url, headers=get_conditional_headers(xml_link)) as response:
+                rate_limiter.check_response(host, response.status, response.headers)
+                if response.status >= 400:
+                    raise http_error(url, response.status)
+                content = b''
+                if response.status != 304:
+                    body = BodyReader(url, response.headers)
+                    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                        body.feed(chunk)
+                    content = body.finish()
+                return FetchResult(url, response.status, response.headers, content,
+                                   elapsed=time.monotonic() - start)
+        except (aiohttp.ClientError, asyncio.TimeoutError, TransientError, PermanentError) as e:
+            status_code = getattr(e, 'status_code', getattr(e, 'status', None))
+            return FetchResult(url, status_code, error=e, elapsed=time.monotonic() - start)
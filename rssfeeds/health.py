@@ -0,0 +1,77 @@
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+
+def ewma(average, value):
+    if average is None:
+        return value
+    return average + settings.FEED_HEALTH_EWMA_ALPHA * (value - average)
+
+
+def failure_backoff(consecutive_failures):
+    """
+    Return how long a feed waits before its next fetch after the given number of consecutive failures:
+    FEED_FAILURE_BACKOFF doubled for every failure after the first, at most FEED_MAX_FAILURE_BACKOFF.
+    """
+    exponent = min(consecutive_failures - 1, 32)
+    return min(settings.FEED_FAILURE_BACKOFF * 2 ** exponent, settings.FEED_MAX_FAILURE_BACKOFF)
+
+
+def record_success(xml_link, elapsed=None, size=None):
+    """
+    Record a refresh of a feed that completed, unchanged or not, and fold its fetch latency and body size
+    into the feed's moving averages.
+    """
+    xml_link.consecutive_failures = 0
+    xml_link.last_success_at = timezone.now()
+    if elapsed is not None:
+        xml_link.avg_fetch_seconds = ewma(xml_link.avg_fetch_seconds, elapsed)
+    if size is not None:
+        xml_link.avg_fetch_bytes = ewma(xml_link.avg_fetch_bytes, size)
+    xml_link.save(update_fields=['consecutive_failures', 'last_success_at', 'avg_fetch_seconds', 'avg_fetch_bytes'])
+
+
+def record_failure(xml_link, exc):
+    """
+    Record a failed refresh of a feed and back off its polling.
+
+    The error and, if known, the part of the body that caused it are stored on the feed, and its next fetch
+    is delayed exponentially in the number of consecutive failures (see failure_backoff). A feed that fails
+    FEED_QUARANTINE_FAILURES times in a row is quarantined: it is not fetched again until it is released.
+    """
+    now = timezone.now()
+    xml_link.consecutive_failures += 1
+    xml_link.last_error = f'{type(exc).__name__}: {exc}'[:1000]
+    xml_link.last_error_snippet = getattr(exc, 'snippet', '') or None
+    xml_link.last_error_at = now
+    xml_link.next_fetch_at = now + failure_backoff(xml_link.consecutive_failures)
+    if xml_link.consecutive_failures >= settings.FEED_QUARANTINE_FAILURES and xml_link.quarantined_at is None:
+        xml_link.quarantined_at = now
+    xml_link.save(update_fields=['consecutive_failures', 'last_error', 'last_error_snippet', 'last_error_at',
+                                 'next_fetch_at', 'quarantined_at'])
+
+
+def release(xml_links):
+    """
+    Take feeds out of quarantine and make them due for an immediate fetch.
+
+    Args:
+        xml_links (QuerySet): The XmlLinks to release.
+
+    Returns:
+        int: The number of released feeds.
+    """
+    return xml_links.update(quarantined_at=None, consecutive_failures=0, next_fetch_at=None)
+
+
+def refreshable_feeds_q(now=None):
+    """
+    Return a filter for the feeds a refresh should fetch: not quarantined, and not waiting out the backoff
+    of a recent failure.
+    """
+    now = now or timezone.now()
+    return Q(quarantined_at__isnull=True) & (
+        Q(consecutive_failures=0) | Q(next_fetch_at__isnull=True) | Q(next_fetch_at__lte=now)
+    )
+
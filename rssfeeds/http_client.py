@@ -0,0 +1,244 @@
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from core.exceptions import PermanentError, http_error
+from core.parsers import SNIFF_BYTES, sniff_feed_format
+
+try:
+    import brotli  # noqa: F401  urllib3 and aiohttp decode 'br' bodies when it is importable
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    ACCEPT_ENCODING = 'gzip, deflate'
+
+CHUNK_SIZE = 64 * 1024
+# Bodies of not-modified and error responses up to this size are read off so the connection can be reused
+MAX_DRAIN_BYTES = 64 * 1024
+
+
+class FeedRejected(PermanentError):
+    """
+    Raised when a download is aborted because the response cannot be a usable feed.
+    """
+
+
+class FeedTooLarge(FeedRejected):
+    """
+    Raised when a feed body exceeds FEED_MAX_BODY_BYTES.
+    """
+
+
+class NotAFeed(FeedRejected):
+    """
+    Raised when a response's content type or first bytes show that it is not an XML document.
+    """
+
+
+class BodyReader:
+    """
+    Collects a streamed response body, aborting as soon as it is clear the body is not a feed we accept.
+
+    The declared Content-Length and Content-Type are checked before any byte is read; the body is then
+    bounded by `max_bytes` (counted after Content-Encoding is decoded, which also stops decompression bombs)
+    and its first SNIFF_BYTES must contain an XML root element other than <html>. The body is kept as raw
+    bytes, so the parser decodes it according to the XML declaration.
+
+    Methods:
+        feed(chunk): Add a chunk of the body.
+        finish(): Return the complete body.
+    """
+
+    def __init__(self, url, headers, max_bytes=None):
+        self.url = url
+        self.max_bytes = max_bytes or settings.FEED_MAX_BODY_BYTES
+        self.chunks = []
+        self.size = 0
+        self.sniffed = False
+
+        content_length = headers.get('Content-Length')
+        if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+            raise FeedTooLarge(f'{url} declares {content_length} bytes, more than {self.max_bytes}')
+        content_type = (headers.get('Content-Type') or '').split(';')[0].strip().lower()
+        if content_type.startswith(tuple(settings.FEED_REJECTED_CONTENT_TYPES)):
+            raise NotAFeed(f'{url} has content type {content_type}')
+
+    def feed(self, chunk):
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise FeedTooLarge(f'{self.url} is larger than {self.max_bytes} bytes')
+        self.chunks.append(chunk)
+        if not self.sniffed and self.size >= SNIFF_BYTES:
+            self.sniff()
+
+    def finish(self):
+        if not self.sniffed:
+            self.sniff()
+        return b''.join(self.chunks)
+
+    def sniff(self):
+        self.sniffed = True
+        head = b''.join(self.chunks)[:SNIFF_BYTES]
+        if sniff_feed_format(head) in (None, 'html'):
+            raise NotAFeed(f'{self.url} is not an XML document', snippet=head[:500].decode('utf-8', 'replace'))
+
+
+class FetchResult:
+    """
+    Response-like container for a downloaded feed body.
+
+    It exposes the subset of the requests.Response interface used by the ingest helpers in rssfeeds.utils
+    (status_code, headers, content, raise_for_status), so batch and single-feed refreshes share the same
+    parse/persist path.
+
+    Attributes:
+        url (str): The requested feed URL.
+        status_code (int or None): HTTP status, or None if the request never completed.
+        headers (Mapping): Case-insensitive response headers.
+        content (bytes): The raw response body.
+        error (Exception or None): The network/timeout/HTTP error raised while fetching, if any.
+        elapsed (float): Wall-clock seconds spent on the request.
+        connection_reused (bool or None): Whether an idle pooled connection was used, if known.
+    """
+
+    def __init__(self, url, status_code=None, headers=None, content=b'', error=None, elapsed=0.0,
+                 connection_reused=None):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers if headers is not None else {}
+        self.content = content
+        self.error = error
+        self.elapsed = elapsed
+        self.connection_reused = connection_reused
+
+    def raise_for_status(self):
+        if self.error:
+            raise self.error
+
+
+class FeedHTTPClient:
+    """
+    Keep-alive HTTP client holding one pooled requests.Session per feed host.
+
+    Feeds hosted on the same provider (Anchor, Libsyn, Feedburner, ...) reuse the TCP/TLS connections of
+    their host's session instead of paying a new handshake per fetch. The least recently used sessions are
+    closed once more than `max_sessions` hosts are tracked. The fetch worker runs tasks on a thread pool, so
+    the session map is guarded by a lock; a request still running on an evicted session completes, and its
+    connection is then closed instead of pooled.
+
+    Attributes:
+        pool_maxsize (int): Number of keep-alive connections kept per host.
+        max_sessions (int): Maximum number of host sessions kept open.
+        timeout (float): Timeout in seconds for a single request.
+
+    Methods:
+        get(url, headers): Perform a GET through the host's session and return a FetchResult. The body is
+            streamed through a BodyReader, so oversized and non-XML responses are aborted early.
+            The small bodies of 304 and error responses are read off, so their connection stays pooled. The
+            result's `connection_reused` flag tells whether an idle pooled connection was used.
+        close(): Close every host session.
+    """
+
+    def __init__(self, pool_maxsize=None, max_sessions=None, timeout=None):
+        self.pool_maxsize = pool_maxsize or settings.FEED_HTTP_POOL_MAXSIZE
+        self.max_sessions = max_sessions or settings.FEED_HTTP_MAX_SESSIONS
+        self.timeout = timeout or settings.FEED_FETCH_TIMEOUT
+        self._sessions = OrderedDict()
+        self._sockets = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def get_session(self, host):
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is not None:
+                self._sessions.move_to_end(host)
+                return session
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+            self._sessions[host] = session
+
+            if len(self._sessions) > self.max_sessions:
+                _, evicted = self._sessions.popitem(last=False)
+                evicted.close()
+            return session
+
+    def get(self, url, headers=None):
+        session = self.get_session(urlsplit(url).netloc)
+
+        start = time.monotonic()
+        with session.get(url, headers=headers, timeout=self.timeout, stream=True) as response:
+            connection_reused = self.is_reused(response)
+            content = b''
+            error = http_error(url, response.status_code) if response.status_code >= 400 else None
+            if error is None and response.status_code != 304:
+                body = BodyReader(url, response.headers)
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    body.feed(chunk)
+                content = body.finish()
+            else:
+                drain(response)
+        return FetchResult(url, response.status_code, response.headers, content, error=error,
+                           elapsed=time.monotonic() - start, connection_reused=connection_reused)
+
+    def is_reused(self, response):
+        """
+        Tell whether the response came over a socket an earlier request already used.
+
+        A pooled connection that was dropped by the server reconnects transparently, so the socket rather
+        than the connection object identifies a reused connection.
+        """
+        connection = getattr(response.raw, 'connection', None)
+        sock = getattr(connection, 'sock', None)
+        if sock is None:
+            return None
+        with self._lock:
+            reused = sock in self._sockets
+            self._sockets.add(sock)
+        return reused
+
+    def close(self):
+        with self._lock:
+            while self._sessions:
+                _, session = self._sessions.popitem()
+                session.close()
+
+
+def drain(response):
+    """
+    Read off the small body of a response whose content is not used, so that closing the response returns its
+    connection to the pool instead of closing it. Larger bodies are left unread and the connection is dropped.
+    """
+    drained = 0
+    for chunk in response.iter_content(CHUNK_SIZE):
+        drained += len(chunk)
+        if drained > MAX_DRAIN_BYTES:
+            break
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_http_client():
+    """
+    Return the FeedHTTPClient of the current process, shared by its threads.
+
+    Clients are keyed by pid so that prefork worker children never share sockets inherited from the parent.
+    """
+    pid = os.getpid()
+    with _clients_lock:
+        client = _clients.get(pid)
+        if client is None:
+            _clients.clear()
+            client = _clients[pid] = FeedHTTPClient()
+    return client
@@ -0,0 +1,189 @@
+import io
+import json
+import platform
+import resource
+import subprocess
+import time
+import tracemalloc
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.category_resolver import category_resolver
+from core.models import Type
+from core.xml_backends import get_backend
+from rssfeeds.models import XmlLink, Channel
+from rssfeeds.synthetic_feeds import generate_feed
+from rssfeeds.utils import item_model_mapper, create_or_update_categories, create_items
+
+
+class Stage:
+    """
+    Measures one benchmark stage: wall time, database queries and the process's peak RSS so far.
+
+    With trace_memory the peak Python heap allocated during the stage is traced as well; tracing slows
+    the stage down, so its timings should not be compared with untraced runs.
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.seconds = self.queries = self.peak_rss_kb = self.peak_memory_kb = None
+
+    def __enter__(self):
+        self.capture = CaptureQueriesContext(connection)
+        self.capture.__enter__()
+        if self.trace_memory:
+            tracemalloc.start()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.seconds = time.perf_counter() - self.start
+        if self.trace_memory:
+            self.peak_memory_kb = tracemalloc.get_traced_memory()[1] // 1024
+            tracemalloc.stop()
+        self.peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        self.capture.__exit__(*exc_info)
+        self.queries = len(self.capture)
+
+
+class Command(BaseCommand):
+    """
+    Custom management command to benchmark feed parsing and ingestion on a synthetic corpus.
+
+    For every feed kind and size it generates a feed (see rssfeeds.synthetic_feeds) and times parsing
+    (whole and streamed), create_or_update_categories with a cold cache, and create_items for a first
+    insert and for an unchanged re-ingest. Database work runs against the configured database inside a
+    transaction that is rolled back.
+
+    Usage:
+        python manage.py benchmark_ingest --sizes 10 1000 20000 --output results.json
+        python manage.py benchmark_ingest --compare results.json
+    """
+
+    help = 'Benchmarks parsing and ingestion of synthetic feeds and optionally stores the results as JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 20000], help='Items per feed.')
+        parser.add_argument('--kinds', nargs='+', choices=['podcast', 'news'], default=['podcast', 'news'])
+        parser.add_argument('--description-size', type=int, default=2000, help='Characters per description.')
+        parser.add_argument('--trace-memory', action='store_true',
+                            help='Trace the peak Python heap of every stage (slows the stages down).')
+        parser.add_argument('--output', help='Write the results to this JSON file.')
+        parser.add_argument('--compare', help='A previous JSON result to compare the timings against.')
+
+    def handle(self, *args, **options):
+        """
+        Handles the execution of the management command.
+
+        Args:
+            args: Additional command-line arguments.
+            options: Additional command-line options.
+        """
+        results = []
+        for kind in options['kinds']:
+            for size in options['sizes']:
+                feed = generate_feed(kind, size, options['description_size'])
+                results.extend(self.benchmark(kind, size, feed, options['trace_memory']))
+
+        report = {
+            'commit': self.get_commit(),
+            'created_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'database': connection.vendor,
+            'xml_backend': get_backend().name,
+            'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            'results': results,
+        }
+        previous = self.load_previous(options['compare'])
+        self.print_report(report, previous)
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(report, indent=2))
+            self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}'))
+
+    def benchmark(self, kind, size, feed, trace_memory):
+        [Parser, model] = item_model_mapper(kind)
+        results = []
+
+        def record(stage_name, stage, items):
+            results.append({
+                'kind': kind, 'size': size, 'stage': stage_name,
+                'seconds': round(stage.seconds, 6),
+                'items_per_sec': round(items / stage.seconds, 1) if stage.seconds else None,
+                'queries': stage.queries,
+                'peak_rss_kb': stage.peak_rss_kb,
+                'peak_memory_kb': stage.peak_memory_kb,
+            })
+
+        with Stage(trace_memory) as stage:
+            parsed = Parser(feed).parse_xml_and_create_records()
+        record('parse', stage, size)
+
+        with Stage(trace_memory) as stage:
+            streamed = Parser(io.BytesIO(feed), stream=True).parse_xml_and_create_records()
+            for _ in streamed['podcast_data']:
+                pass
+        record('parse_stream', stage, size)
+
+        with transaction.atomic():
+            category_resolver.clear()
+            with Stage(trace_memory) as stage:
+                create_or_update_categories(parsed['channel_data']['categories'])
+            record('categories', stage, 1)
+
+            channel = self.create_channel(kind, parsed['channel_data']['data'])
+            items = parsed['podcast_data']
+            with Stage(trace_memory) as stage:
+                create_items(model, channel, items)
+            record('create_items', stage, size)
+
+            with Stage(trace_memory) as stage:
+                create_items(model, channel, items)
+            record('create_items_unchanged', stage, size)
+
+            transaction.set_rollback(True)
+        category_resolver.clear()
+        return results
+
+    @staticmethod
+    def create_channel(kind, channel_data):
+        # bulk_create skips the search index signals, so no Elasticsearch cluster is needed
+        rss_type, _ = Type.objects.get_or_create(name=kind.capitalize())
+        [xml_link] = XmlLink.objects.bulk_create([
+            XmlLink(xml_link=f'https://benchmark.invalid/{uuid.uuid4()}.xml', rss_type=rss_type)
+        ])
+        [channel] = Channel.objects.bulk_create([Channel(xml_link=xml_link, **channel_data)])
+        return channel
+
+    @staticmethod
+    def get_commit():
+        try:
+            return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    @staticmethod
+    def load_previous(path):
+        if not path:
+            return {}
+        previous = json.loads(Path(path).read_text())
+        return {(r['kind'], r['size'], r['stage']): r for r in previous['results']}
+
+    def print_report(self, report, previous):
+        self.stdout.write(f'commit {report["commit"]}, {report["database"]}, {report["xml_backend"]} backend, '
+                          f'peak RSS {report["peak_rss_kb"] // 1024} MB')
+        self.stdout.write(f'{"kind":<8}{"size":>7}  {"stage":<24}{"seconds":>10}{"items/s":>12}{"queries":>9}'
+                          f'{"RSS MB":>8}{"heap KB":>10}{"vs prev":>9}')
+        for r in report['results']:
+            before = previous.get((r['kind'], r['size'], r['stage']))
+            change = f'{(r["seconds"] / before["seconds"] - 1) * 100:+.0f}%' if before and before['seconds'] else ''
+            self.stdout.write(f'{r["kind"]:<8}{r["size"]:>7}  {r["stage"]:<24}{r["seconds"]:>10.4f}'
+                              f'{r["items_per_sec"] or 0:>12.0f}{r["queries"]:>9}{r["peak_rss_kb"] // 1024:>8}'
+                              f'{r["peak_memory_kb"] if r["peak_memory_kb"] is not None else "-":>10}{change:>9}')
@@ -0,0 +1,68 @@
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Min
+from django.db.models.functions import Left
+
+from interactions.models import BookMark, Comment, Like
+from rssfeeds.models import News, Podcast
+
+
+class Command(BaseCommand):
+    """
+    Custom management command to remove the items that repeat a GUID within their channel.
+
+    Items are unique per (channel, guid) now, and the generated migration fails on a database that already
+    holds such duplicates, so this runs once before migrating. Podcast episodes stored without a GUID are
+    given their audio file URL as GUID first, as the parser does now, so they are not taken for duplicates
+    of each other. Of each set of duplicates the oldest item is kept, and the comments, likes and bookmarks
+    of the others are moved to it. Only the columns that predate the migration are read.
+
+    Usage:
+        python manage.py dedupe_feed_items
+    """
+
+    help = 'Removes items with a repeated GUID in their channel before the unique constraints are applied.'
+
+    def handle(self, *args, **options):
+        """
+        Handles the execution of the management command.
+
+        Args:
+            args: Additional command-line arguments.
+            options: Additional command-line options.
+        """
+        with transaction.atomic():
+            guid_length = Podcast._meta.get_field('guid').max_length
+            Podcast.objects.filter(guid='').exclude(audio_file='').update(guid=Left(F('audio_file'), guid_length))
+            for model in (Podcast, News):
+                removed = self.dedupe(model)
+                self.stdout.write(self.style.SUCCESS(f'Removed {removed} duplicate {model.__name__} items.'))
+
+    def dedupe(self, model):
+        content_type = ContentType.objects.get_for_model(model)
+        groups = (model.objects.values('channel_id', 'guid').annotate(copies=Count('id'), keep=Min('id'))
+                  .filter(copies__gt=1))
+        removed = 0
+        for group in list(groups):
+            duplicate_ids = list(
+                model.objects.filter(channel_id=group['channel_id'], guid=group['guid'])
+                .exclude(pk=group['keep']).values_list('id', flat=True)
+            )
+            for interaction in (Comment, Like, BookMark):
+                interaction.objects.filter(content_type=content_type, object_id__in=duplicate_ids).update(
+                    object_id=group['keep']
+                )
+            for interaction in (Like, BookMark):
+                # A user who liked or bookmarked several copies keeps a single like or bookmark
+                users = set()
+                repeated = []
+                for pk, user_id in (interaction.objects.filter(content_type=content_type, object_id=group['keep'])
+                                    .order_by('id').values_list('id', 'user_id')):
+                    if user_id in users:
+                        repeated.append(pk)
+                    users.add(user_id)
+                interaction.objects.filter(pk__in=repeated).delete()
+            model.objects.filter(pk__in=duplicate_ids).only('id').delete()
+            removed += len(duplicate_ids)
+        return removed
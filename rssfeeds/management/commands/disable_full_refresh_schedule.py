@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django_celery_beat.models import PeriodicTask
+
+
+class Command(BaseCommand):
+    """
+    Custom management command to disable the nightly update_rssfeeds beat entry of existing deployments.
+
+    Feeds are refreshed by schedule_due_feeds now. The DatabaseScheduler only adds and updates the
+    CELERY_BEAT_SCHEDULE entries and never removes a stored one, so a database set up before the switch
+    keeps running the full update_rssfeeds fan-out every night unless its PeriodicTask is disabled. Manual
+    refreshes through the update_rssfeeds API are not affected.
+
+    Usage:
+        python manage.py disable_full_refresh_schedule
+    """
+
+    help = 'Disables the periodic tasks that run the full update_rssfeeds refresh.'
+
+    def handle(self, *args, **options):
+        """
+        Handles the execution of the management command.
+
+        Args:
+            args: Additional command-line arguments.
+            options: Additional command-line options.
+        """
+        periodic_tasks = PeriodicTask.objects.filter(task='rssfeeds.tasks.update_rssfeeds', enabled=True)
+        names = list(periodic_tasks.values_list('name', flat=True))
+        for periodic_task in periodic_tasks:
+            periodic_task.enabled = False
+            periodic_task.save()  # save() rather than update(), so the beat scheduler reloads its schedule
+        self.stdout.write(self.style.SUCCESS(
+            f'Disabled {len(names)} periodic tasks{": " + ", ".join(names) if names else ""}.'
+        ))
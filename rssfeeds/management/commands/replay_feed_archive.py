@@ -0,0 +1,130 @@
+import multiprocessing
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from rssfeeds.feed_archive import get_feed_archive
+from rssfeeds.models import ArchivedFeed, XmlLink
+from rssfeeds.tasks import persist_feed
+from rssfeeds.utils import parse_feed, update_search_index
+
+
+def replay_feed(xml_link_id, entry_ids, dry_run=False):
+    """
+    Re-ingest the archived bodies of one feed, oldest first, through the current parsers and create_items.
+
+    Returns:
+        tuple: (Counter of bodies, items, updated items and failed bodies, list of error messages).
+    """
+    xml_link = XmlLink.objects.select_related('rss_type').get(id=xml_link_id)
+    archive = get_feed_archive()
+    counts = Counter()
+    errors = []
+    for entry in ArchivedFeed.objects.filter(id__in=entry_ids).order_by('fetched_at', 'id'):
+        try:
+            parsed_data = parse_feed(xml_link.rss_type.name, archive.read(entry))
+            if dry_run:
+                counts['items'] += sum(1 for _ in parsed_data['podcast_data'])
+            else:
+                parsed_data['podcast_data'] = list(parsed_data['podcast_data'])
+                with transaction.atomic():
+                    _, _, model, updated_items = persist_feed(xml_link, parsed_data, full_scan=True)
+                update_search_index(model, updated_items)
+                counts['items'] += len(parsed_data['podcast_data'])
+                counts['updated'] += len(updated_items)
+            counts['bodies'] += 1
+        except Exception as e:
+            counts['failed'] += 1
+            errors.append(f'{xml_link.xml_link} fetched at {entry.fetched_at}: {e!r}')
+    return counts, errors
+
+
+class Command(BaseCommand):
+    """
+    Custom management command to re-ingest archived feed bodies without refetching them.
+
+    Bodies are read from the raw-feed archive (see rssfeeds.feed_archive) and go through the same
+    parse_feed -> create_items path as fetched feeds, with every item compared, so a parser fix reaches
+    all stored items. Feeds are spread over worker processes; the bodies of one feed are replayed in
+    fetch order by a single worker. By default only the latest body of each feed is replayed.
+
+    Usage:
+        python manage.py replay_feed_archive --workers 8
+        python manage.py replay_feed_archive --xml-links 12 40 --all-versions --since 2024-01-01
+    """
+
+    help = 'Re-ingests archived feed bodies through the current parsers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--xml-links', type=int, nargs='+', help='Replay only these XmlLink ids.')
+        parser.add_argument('--since', help='Replay bodies fetched at or after this ISO 8601 date-time.')
+        parser.add_argument('--until', help='Replay bodies fetched before this ISO 8601 date-time.')
+        parser.add_argument('--all-versions', action='store_true',
+                            help='Replay every archived body of a feed instead of only the latest one.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Replay processes.')
+        parser.add_argument('--dry-run', action='store_true', help='Only parse the bodies, save nothing.')
+
+    def handle(self, *args, **options):
+        """
+        Handles the execution of the management command.
+
+        Args:
+            args: Additional command-line arguments.
+            options: Additional command-line options.
+        """
+        entries = ArchivedFeed.objects.order_by('xml_link_id', 'fetched_at', 'id')
+        if options['xml_links']:
+            entries = entries.filter(xml_link_id__in=options['xml_links'])
+        if options['since']:
+            entries = entries.filter(fetched_at__gte=self.get_datetime(options['since']))
+        if options['until']:
+            entries = entries.filter(fetched_at__lt=self.get_datetime(options['until']))
+
+        feeds = {}
+        for entry_id, xml_link_id in entries.values_list('id', 'xml_link_id'):
+            if options['all_versions']:
+                feeds.setdefault(xml_link_id, []).append(entry_id)
+            else:
+                feeds[xml_link_id] = [entry_id]
+
+        start = time.perf_counter()
+        counts = Counter()
+        for feed_counts, errors in self.replay(feeds, options['workers'], options['dry_run']):
+            counts.update(feed_counts)
+            for error in errors:
+                self.stderr.write(error)
+        seconds = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Replayed {counts["bodies"]} bodies of {len(feeds)} feeds in {seconds:.1f}s: {counts["items"]} '
+            f'items, {counts["updated"]} updated, {counts["failed"]} failed bodies'
+            f'{" (dry run)" if options["dry_run"] else ""}'
+        ))
+
+    @staticmethod
+    def replay(feeds, workers, dry_run):
+        if workers <= 1 or len(feeds) <= 1:
+            for xml_link_id, entry_ids in feeds.items():
+                yield replay_feed(xml_link_id, entry_ids, dry_run)
+            return
+
+        # Closed before forking, so no worker inherits the parent's database connection
+        connections.close_all()
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork')) as executor:
+            futures = [executor.submit(replay_feed, xml_link_id, entry_ids, dry_run)
+                       for xml_link_id, entry_ids in feeds.items()]
+            for future in as_completed(futures):
+                yield future.result()
+
+    @staticmethod
+    def get_datetime(value):
+        parsed = parse_datetime(value) or parse_datetime(f'{value}T00:00:00')
+        if parsed is None:
+            raise CommandError(f'Invalid date-time: {value}')
+        return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
@@ -7,11 +7,44 @@ from core.models import Type, Category
 class XmlLink(models.Model):
     xml_link = models.URLField(max_length=500, unique=True)
     rss_type = models.ForeignKey(Type, on_delete=models.PROTECT)
+    etag = models.CharField(max_length=255, null=True, blank=True)
+    last_modified = models.CharField(max_length=64, null=True, blank=True)
+    content_length = models.PositiveBigIntegerField(null=True, blank=True)
+    content_hash = models.CharField(max_length=64, null=True, blank=True)
+    normalized_hash = models.CharField(max_length=64, null=True, blank=True)
+    next_fetch_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    last_error = models.TextField(null=True, blank=True)
+    last_error_snippet = models.TextField(null=True, blank=True)
+    last_error_at = models.DateTimeField(null=True, blank=True)
+    consecutive_failures = models.PositiveIntegerField(default=0)
+    last_success_at = models.DateTimeField(null=True, blank=True)
+    avg_fetch_seconds = models.FloatField(null=True, blank=True)
+    avg_fetch_bytes = models.FloatField(null=True, blank=True)
+    quarantined_at = models.DateTimeField(null=True, blank=True, db_index=True)
 
     def __str__(self):
         return f'{self.rss_type} //{self.xml_link}'
 
 
+class ArchivedFeed(models.Model):
+    """
+    Index entry of a fetched feed body stored in the raw-feed archive (see rssfeeds.feed_archive).
+    """
+    xml_link = models.ForeignKey(XmlLink, on_delete=models.CASCADE, related_name='archived_feeds')
+    fetched_at = models.DateTimeField(auto_now_add=True)
+    segment = models.CharField(max_length=100)
+    offset = models.PositiveBigIntegerField()
+    length = models.PositiveIntegerField()
+    size = models.PositiveIntegerField()
+    content_hash = models.CharField(max_length=64)
+
+    class Meta:
+        indexes = [models.Index(fields=['xml_link', 'fetched_at'])]
+
+    def __str__(self):
+        return f'{self.xml_link_id} @ {self.fetched_at}'
+
+
 class Channel(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField(null=True, blank=True)
@@ -23,6 +56,9 @@ class Channel(models.Model):
     xml_link = models.OneToOneField(XmlLink, on_delete=models.CASCADE)
     category = models.ManyToManyField(Category, blank=True)
     owner = models.CharField(max_length=100)
+    newest_item_pub_date = models.DateTimeField(null=True, blank=True)
+    recent_guids = models.JSONField(default=list, blank=True)
+    last_full_scan_at = models.DateTimeField(null=True, blank=True)
 
     def subscriptions_list(self):
         return self.subscriptions.all()
@@ -37,12 +73,16 @@ class AbstractBase(models.Model):
     guid = models.CharField(max_length=150)
     pub_date = models.DateTimeField(null=True, blank=True)
     image = models.URLField(max_length=500, null=True, blank=True)
+    fingerprint = models.CharField(max_length=40, null=True, blank=True)
     comment = GenericRelation('interactions.comment')
     like = GenericRelation('interactions.like')
     bookmark = GenericRelation('interactions.bookmark')
 
     class Meta:
         abstract = True
+        constraints = [
+            models.UniqueConstraint(fields=['channel', 'guid'], name='%(app_label)s_%(class)s_unique_channel_guid'),
+        ]
 
     def __str__(self):
         return self.title
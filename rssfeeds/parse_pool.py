@@ -0,0 +1,89 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import django
+from django.conf import settings
+
+from .utils import parse_feed
+
+
+def parse_in_worker(rss_type, content, incremental_channel):
+    """
+    Parse a feed body in a pool process and return a picklable result, with the items as a list.
+    """
+    parsed_data = parse_feed(rss_type, content, incremental_channel)
+    parsed_data['podcast_data'] = list(parsed_data['podcast_data'])
+    return parsed_data
+
+
+class ParsePool:
+    """
+    Process pool that parses downloaded feed bodies off the fetching worker's GIL.
+
+    Fetch workers are I/O-bound and parsing is CPU-bound, so parsing in FEED_PARSE_WORKERS separate
+    processes lets fetch concurrency and parse parallelism scale independently. Each feed is parsed into
+    its channel data and item list, which come back to the fetching worker for persistence.
+
+    Pool processes are started by a fork server, not forked from the worker: the fetch worker runs threads
+    (other fetches, the Elasticsearch log handler's connection pool), and a child forked from it could inherit
+    their held locks and sockets. Each pool process sets Django up once when it starts.
+
+    Parsing stays inline when the pool is disabled (FEED_PARSE_WORKERS = 0) and when the current process
+    is daemonic, e.g. a Celery prefork child, which may not start processes of its own. Feeds larger than
+    FEED_STREAM_PARSE_THRESHOLD also stay inline so that they are still streamed and persisted in batches.
+
+    Methods:
+        submit(xml_link, content, incremental_channel): Start parsing a feed body and return a Future of
+            its parsed data.
+        shutdown(): Stop the pool processes.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = settings.FEED_PARSE_WORKERS if workers is None else workers
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()  # fetch worker threads share the pool
+
+    @property
+    def enabled(self):
+        return self.workers > 0 and not multiprocessing.current_process().daemon
+
+    def get_executor(self):
+        # A pool inherited across fork belongs to the parent, and a broken pool (a worker was killed, e.g. by
+        # the OOM killer) rejects all work, so both are replaced
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid() or self._executor._broken:
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('forkserver'),
+                                                     initializer=django.setup)
+                self._pid = os.getpid()
+            return self._executor
+
+    def submit(self, xml_link, content, incremental_channel=None):
+        rss_type = xml_link.rss_type.name
+        if self.enabled and len(content) <= settings.FEED_STREAM_PARSE_THRESHOLD:
+            return self.get_executor().submit(parse_in_worker, rss_type, content, incremental_channel)
+
+        future = Future()
+        try:
+            future.set_result(parse_feed(rss_type, content, incremental_channel))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown()
+            self._executor = None
+
+
+_parse_pool = None
+
+
+def get_parse_pool():
+    global _parse_pool
+    if _parse_pool is None:
+        _parse_pool = ParsePool()
+    return _parse_pool
@@ -0,0 +1,85 @@
+import pickle
+import uuid
+import zlib
+from itertools import islice
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+from core.exceptions import PermanentError
+
+
+class PayloadMissing(PermanentError):
+    """
+    Raised when a payload reference points to data that expired or was already deleted.
+    """
+
+
+class PayloadStore:
+    """
+    Short-lived Redis storage for the intermediate payloads of the staged ingest pipeline.
+
+    Feed bodies and parsed feeds can be megabytes large, so pipeline stages pass a key instead of the data
+    through the broker. Payloads are zlib-compressed and expire after FEED_PAYLOAD_TTL seconds, so data left
+    behind by a failed pipeline cleans itself up.
+
+    Methods:
+        put(data): Store bytes and return their key.
+        get(key): Return the bytes stored under a key.
+        put_object(obj): Store a picklable object and return its key.
+        get_object(key): Return the object stored under a key.
+        put_chunks(objects, chunk_size): Store an iterable of picklable objects in chunks and return their keys.
+        iter_chunks(keys): Yield the objects stored with put_chunks, loading one chunk at a time.
+        delete(*keys): Drop payloads that are no longer needed.
+    """
+    key_prefix = 'feed_payload:'
+
+    def __init__(self, connection=None):
+        self.connection = connection or get_redis_connection('default')
+
+    def put(self, data):
+        key = f'{self.key_prefix}{uuid.uuid4().hex}'
+        self.connection.set(key, zlib.compress(data, 1), ex=settings.FEED_PAYLOAD_TTL)
+        return key
+
+    def get(self, key):
+        data = self.connection.get(key)
+        if data is None:
+            raise PayloadMissing(f'Payload {key} expired or was deleted')
+        return zlib.decompress(data)
+
+    def put_object(self, obj):
+        return self.put(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def get_object(self, key):
+        return pickle.loads(self.get(key))
+
+    def put_chunks(self, objects, chunk_size):
+        # Consumes the iterable lazily, so a streamed parse never holds more than one chunk of items
+        keys = []
+        objects = iter(objects)
+        try:
+            while chunk := list(islice(objects, chunk_size)):
+                keys.append(self.put_object(chunk))
+        except BaseException:
+            self.delete(*keys)
+            raise
+        return keys
+
+    def iter_chunks(self, keys):
+        for key in keys:
+            yield from self.get_object(key)
+
+    def delete(self, *keys):
+        if keys:
+            self.connection.delete(*keys)
+
+
+_payload_store = None
+
+
+def get_payload_store():
+    global _payload_store
+    if _payload_store is None:
+        _payload_store = PayloadStore()
+    return _payload_store
@@ -0,0 +1,175 @@
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from django.conf import settings
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from core.exceptions import TransientError
+
+logger = logging.getLogger('elastic-logger')
+
+# Reserves one token from the host's bucket and returns how long the caller has to wait before using it.
+# The bucket may go negative (a reservation queue) but never beyond max_wait seconds of backlog, and a
+# host blocked by a Retry-After response hands out no tokens until the block expires.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local max_wait = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+local blocked_until = tonumber(redis.call('GET', KEYS[2]) or '0')
+if blocked_until > now then
+    return {0, tostring(blocked_until - now)}
+end
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + (now - ts) * rate) - 1
+
+local wait = 0
+if tokens < 0 then
+    wait = -tokens / rate
+end
+if wait > max_wait then
+    return {0, tostring(wait)}
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate + max_wait) + 60)
+return {1, tostring(wait)}
+"""
+
+
+class HostRateLimited(TransientError):
+    """
+    Raised when a feed host cannot be fetched right now, either because its token bucket is exhausted
+    beyond the allowed wait or because it answered 429/503 with Retry-After.
+
+    Attributes:
+        host (str): The throttled host.
+        retry_after (float): Seconds to wait before the host should be tried again.
+    """
+
+    def __init__(self, host, retry_after):
+        self.host = host
+        self.retry_after = retry_after
+        super().__init__(f'Host {host} is rate limited for {retry_after:.1f} seconds')
+
+
+class HostRateLimiter:
+    """
+    Per-host token-bucket rate limiter shared by all Celery workers through Redis.
+
+    Limits are looked up in FEED_HOST_RATE_LIMITS by host suffix (so 'libsyn.com' also covers
+    'traffic.libsyn.com') and default to FEED_RATE_LIMIT_DEFAULT; both are (tokens per second, burst).
+    If Redis is unreachable the limiter fails open and fetches proceed unthrottled.
+
+    Methods:
+        acquire(host): Block until a token for the host is available.
+        acquire_async(host): Coroutine version of acquire() for the batch fetch engine.
+        block(host, retry_after): Stop handing out tokens for a host, e.g. after a 429 response.
+        check_response(host, status_code, headers): Block the host and raise HostRateLimited on 429 (or 503
+            with Retry-After) responses.
+    """
+    bucket_key = 'feed_rate_limit:bucket:{}'
+    block_key = 'feed_rate_limit:block:{}'
+
+    def __init__(self, connection=None):
+        self.connection = connection or get_redis_connection('default')
+        self.script = self.connection.register_script(TOKEN_BUCKET_SCRIPT)
+
+    @staticmethod
+    def get_limits(host):
+        host = host.lower().split(':')[0]
+        for domain, limits in settings.FEED_HOST_RATE_LIMITS.items():
+            if host == domain or host.endswith(f'.{domain}'):
+                return limits
+        return settings.FEED_RATE_LIMIT_DEFAULT
+
+    def reserve(self, host):
+        """
+        Reserve a token for the host.
+
+        Returns:
+            float: Seconds to wait before the reserved token may be used.
+
+        Raises:
+            HostRateLimited: If the host is blocked or would need more than FEED_RATE_LIMIT_MAX_WAIT seconds.
+        """
+        rate, burst = self.get_limits(host)
+        try:
+            acquired, wait = self.script(keys=[self.bucket_key.format(host), self.block_key.format(host)],
+                                         args=[rate, burst, settings.FEED_RATE_LIMIT_MAX_WAIT])
+        except RedisError as e:
+            log_data = {'event': f'rate_limit.{host}', 'message': f'Rate limiter unavailable, failing open: {e}'}
+            logger.warning(json.dumps(log_data))
+            return 0
+        if not acquired:
+            raise HostRateLimited(host, float(wait))
+        return float(wait)
+
+    def acquire(self, host):
+        wait = self.reserve(host)
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self, host):
+        wait = self.reserve(host)
+        if wait:
+            await asyncio.sleep(wait)
+
+    def block(self, host, retry_after):
+        blocked_until = time.time() + retry_after
+        try:
+            self.connection.set(self.block_key.format(host), blocked_until, ex=max(1, int(retry_after) + 1))
+        except RedisError:
+            pass
+
+    def check_response(self, host, status_code, headers):
+        if status_code not in (429, 503):
+            return
+        retry_after = parse_retry_after(headers.get('Retry-After'))
+        if retry_after is None:
+            if status_code == 503:
+                return
+            retry_after = settings.FEED_RETRY_AFTER_DEFAULT
+        self.block(host, retry_after)
+        raise HostRateLimited(host, retry_after)
+
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header given either as delay-seconds or as an HTTP date.
+
+    Returns:
+        float: Seconds to wait, or None if the header is missing or malformed.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+_rate_limiter = None
+
+
+def get_rate_limiter():
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = HostRateLimiter()
+    return _rate_limiter
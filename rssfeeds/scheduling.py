@@ -0,0 +1,67 @@
+from datetime import timedelta
+from statistics import median
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import XmlLink
+from .utils import item_model_mapper
+
+
+def compute_poll_interval(pub_dates):
+    """
+    Derive a polling interval from the publish dates of a feed's most recent items.
+
+    The interval is FEED_POLL_INTERVAL_FACTOR times the median gap between consecutive items, clamped to
+    [FEED_MIN_POLL_INTERVAL, FEED_MAX_POLL_INTERVAL]. Feeds without enough dated items get
+    FEED_DEFAULT_POLL_INTERVAL.
+
+    Args:
+        pub_dates (list): Item publish dates, newest first.
+
+    Returns:
+        timedelta: The time to wait before the next fetch.
+    """
+    gaps = [(newer - older).total_seconds() for newer, older in zip(pub_dates, pub_dates[1:]) if newer > older]
+    if not gaps:
+        return settings.FEED_DEFAULT_POLL_INTERVAL
+
+    interval = timedelta(seconds=median(gaps) * settings.FEED_POLL_INTERVAL_FACTOR)
+    return min(max(interval, settings.FEED_MIN_POLL_INTERVAL), settings.FEED_MAX_POLL_INTERVAL)
+
+
+def schedule_next_fetch(xml_link):
+    model = item_model_mapper(xml_link.rss_type.name)[1]
+    pub_dates = list(
+        model.objects
+        .filter(channel__xml_link=xml_link, pub_date__isnull=False)
+        .order_by('-pub_date')
+        .values_list('pub_date', flat=True)[:settings.FEED_POLL_SAMPLE_SIZE]
+    )
+    xml_link.next_fetch_at = timezone.now() + compute_poll_interval(pub_dates)
+    xml_link.save(update_fields=['next_fetch_at'])
+    return xml_link.next_fetch_at
+
+
+def claim_due_feeds(limit):
+    """
+    Select up to `limit` feeds whose next_fetch_at has passed, most overdue first.
+
+    The claimed feeds are pushed FEED_SCHEDULER_LEASE into the future so that following scheduler ticks do
+    not enqueue them again while they are still queued or being fetched; a successful fetch then replaces
+    the lease with the real next_fetch_at. Quarantined feeds are never claimed.
+
+    Returns:
+        list: Ids of the claimed XmlLinks.
+    """
+    now = timezone.now()
+    xml_link_ids = list(
+        XmlLink.objects
+        .filter(Q(next_fetch_at__lte=now) | Q(next_fetch_at__isnull=True), channel__isnull=False,
+                quarantined_at__isnull=True)
+        .order_by(F('next_fetch_at').asc(nulls_first=True))
+        .values_list('id', flat=True)[:limit]
+    )
+    XmlLink.objects.filter(id__in=xml_link_ids).update(next_fetch_at=now + settings.FEED_SCHEDULER_LEASE)
+    return xml_link_ids
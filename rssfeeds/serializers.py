@@ -18,6 +18,20 @@ class XmlLinkSerializer(serializers.ModelSerializer):
         }
 
 
+class FeedHealthSerializer(serializers.ModelSerializer):
+    quarantined = serializers.SerializerMethodField()
+
+    class Meta:
+        model = XmlLink
+        fields = ['id', 'xml_link', 'rss_type', 'quarantined', 'quarantined_at', 'consecutive_failures',
+                  'last_success_at', 'last_error', 'last_error_snippet', 'last_error_at', 'avg_fetch_seconds',
+                  'avg_fetch_bytes', 'next_fetch_at']
+        read_only_fields = fields
+
+    def get_quarantined(self, obj):
+        return obj.quarantined_at is not None
+
+
 class ChannelSerializer(serializers.ModelSerializer):
     subscribed = serializers.SerializerMethodField()
 
@@ -0,0 +1,73 @@
+import json
+import logging
+
+from django.conf import settings
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+logger = logging.getLogger('elastic-logger')
+
+# Deletes a lease only if it is still held by the given token, so a task whose lease expired and was taken
+# over by a newer run never releases the newer run's lease.
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class FeedLeases:
+    """
+    Single-flight leases that keep a feed from being queued or refreshed by two tasks at once.
+
+    A lease is taken when a refresh is enqueued and is held by a random token, which the task receives in its
+    `lease` kwarg and MyTask releases when the refresh ends (see core.base_task). Triggers that find the
+    lease taken are collapsed into the run already queued or running. Leases expire after FEED_LEASE_TTL
+    seconds, so a worker that dies never blocks a feed for longer than that. If Redis is unreachable the
+    leases fail open and every trigger is enqueued, as before.
+
+    Methods:
+        acquire(names, token): Take the free leases among `names` for `token` and return their names.
+        release(names, token): Give back the leases among `names` that `token` still holds.
+    """
+    key_prefix = 'feed_lease:'
+
+    def __init__(self, connection=None):
+        self.connection = connection or get_redis_connection('default')
+        self.release_script = self.connection.register_script(RELEASE_SCRIPT)
+
+    def get_key(self, name):
+        return f'{self.key_prefix}{name}'
+
+    def acquire(self, names, token, ttl=None):
+        names = list(names)
+        pipe = self.connection.pipeline(transaction=False)
+        for name in names:
+            pipe.set(self.get_key(name), token, nx=True, ex=ttl or settings.FEED_LEASE_TTL)
+        try:
+            acquired = pipe.execute()
+        except RedisError as e:
+            log_data = {'event': 'single_flight.acquire', 'message': f'Leases unavailable, failing open: {e}'}
+            logger.warning(json.dumps(log_data))
+            return names
+        return [name for name, ok in zip(names, acquired) if ok]
+
+    def release(self, names, token):
+        pipe = self.connection.pipeline(transaction=False)
+        for name in names:
+            self.release_script(keys=[self.get_key(name)], args=[token], client=pipe)
+        try:
+            pipe.execute()
+        except RedisError:
+            pass  # the leases expire on their own
+
+
+_feed_leases = None
+
+
+def get_feed_leases():
+    global _feed_leases
+    if _feed_leases is None:
+        _feed_leases = FeedLeases()
+    return _feed_leases
@@ -0,0 +1,114 @@
+import random
+from datetime import datetime, timedelta, timezone
+from xml.sax.saxutils import escape
+
+WORDS = ('feed', 'episode', 'news', 'market', 'science', 'health', 'python', 'music', 'culture', 'history',
+         'update', 'weekly', 'interview', 'report', 'analysis', 'travel', 'sport', 'design', 'data', 'film')
+
+CATEGORIES = {
+    'Technology': {'Software': {'Open Source': {}, 'Databases': {}}, 'Gadgets': {}},
+    'News': {'Politics': {}, 'Business': {'Markets': {}}},
+    'Arts': {'Books': {}, 'Design': {}},
+}
+
+# Every feed mixes the date layouts found in the wild, so date parsing is measured on realistic input
+DATE_FORMATS = (
+    lambda d: d.strftime('%a, %d %b %Y %H:%M:%S +0000'),
+    lambda d: d.astimezone(timezone(timedelta(hours=-5))).strftime('%a, %d %b %Y %H:%M:%S EST'),
+    lambda d: d.strftime('%Y-%m-%dT%H:%M:%SZ'),
+    lambda d: d.astimezone(timezone(timedelta(hours=3, minutes=30))).isoformat(),
+)
+
+HEADER = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+          '<rss version="2.0" xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd" '
+          'xmlns:media="http://search.yahoo.com/mrss/">\n<channel>\n')
+
+
+def generate_feed(kind, items, description_size=2000, seed=0):
+    """
+    Build a synthetic RSS 2.0 feed for benchmarks.
+
+    The output is deterministic for a given seed. Items are listed newest first with large descriptions,
+    mixed date formats and, for podcasts, nested iTunes categories.
+
+    Args:
+        kind (str): 'podcast' or 'news'.
+        items (int): Number of items.
+        description_size (int, optional): Approximate length of each item description in characters.
+        seed (int, optional): Seed of the random generator.
+
+    Returns:
+        bytes: The UTF-8 encoded feed.
+    """
+    rng = random.Random(seed)
+    newest = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    item_builder = podcast_item if kind == 'podcast' else news_item
+
+    parts = [HEADER, channel_header(kind, rng)]
+    for i in range(items):
+        pub_date = DATE_FORMATS[i % len(DATE_FORMATS)](newest - timedelta(hours=6 * i))
+        parts.append(item_builder(i, pub_date, sentence(rng, description_size)))
+    parts.append('</channel>\n</rss>\n')
+    return ''.join(parts).encode()
+
+
+def sentence(rng, size):
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return ' '.join(words)
+
+
+def categories_xml(categories):
+    return ''.join(
+        f'<itunes:category text="{escape(name)}">{categories_xml(children)}</itunes:category>'
+        if children else f'<itunes:category text="{escape(name)}"/>'
+        for name, children in categories.items()
+    )
+
+
+def channel_header(kind, rng):
+    return (
+        f'<title>Synthetic {kind} feed</title>\n'
+        f'<description>{escape(sentence(rng, 300))}</description>\n'
+        '<language>en</language>\n'
+        '<pubDate>Mon, 01 Jan 2024 00:00:00 +0000</pubDate>\n'
+        '<itunes:subtitle>Benchmark corpus</itunes:subtitle>\n'
+        '<itunes:author>Benchmark</itunes:author>\n'
+        '<itunes:owner><itunes:name>Benchmark</itunes:name></itunes:owner>\n'
+        '<itunes:image href="https://example.com/cover.jpg"/>\n'
+        f'{categories_xml(CATEGORIES)}\n'
+    )
+
+
+def podcast_item(i, pub_date, description):
+    return (
+        '<item>\n'
+        f'  <title>Episode {i}: {escape(description[:60])}</title>\n'
+        f'  <itunes:subtitle>{escape(description[:120])}</itunes:subtitle>\n'
+        f'  <description><![CDATA[<p>{description}</p>]]></description>\n'
+        f'  <guid isPermaLink="false">synthetic-episode-{i}</guid>\n'
+        f'  <pubDate>{pub_date}</pubDate>\n'
+        f'  <itunes:duration>{(i * 37) % 3600 + 600}</itunes:duration>\n'
+        f'  <enclosure url="https://cdn.example.com/episodes/{i}.mp3" length="1000000" type="audio/mpeg"/>\n'
+        f'  <itunes:image href="https://cdn.example.com/episodes/{i}.jpg"/>\n'
+        f'  <itunes:explicit>{"yes" if i % 10 == 0 else "no"}</itunes:explicit>\n'
+        '</item>\n'
+    )
+
+
+def news_item(i, pub_date, description):
+    return (
+        '<item>\n'
+        f'  <title>Story {i}: {escape(description[:60])}</title>\n'
+        f'  <link>https://news.example.com/stories/{i}</link>\n'
+        f'  <description><![CDATA[<p>{description}</p>]]></description>\n'
+        f'  <guid>https://news.example.com/stories/{i}</guid>\n'
+        f'  <pubDate>{pub_date}</pubDate>\n'
+        '  <source url="https://news.example.com/rss">Example News</source>\n'
+        f'  <media:content url="https://cdn.example.com/stories/{i}.jpg" medium="image"/>\n'
+        '</item>\n'
+    )
@@ -1,17 +1,137 @@
+from collections import Counter
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
+from django.conf import settings
 from django.utils.translation import gettext_lazy as _
-from celery import shared_task
+from celery import shared_task, chain
+from celery.utils import uuid
+from celery.signals import worker_process_init
+from django.db import DatabaseError, DataError, IntegrityError, transaction
+from elasticsearch.exceptions import ConnectionError as ElasticsearchConnectionError
+from pika.exceptions import AMQPConnectionError
 
 from accounts.publishers import EventPublisher
 from core.base_task import MyTask
-from .utils import parse_data, create_or_update_categories, create_or_update_channel, create_items, log_task_info
+from core.category_resolver import category_resolver
+from core.exceptions import FEED_ERRORS, PermanentError, TRANSIENT_ERRORS, UnparsableFeed
+from .utils import (
+    fetch_feed, get_content_hashes, is_unchanged, needs_full_scan, get_validator_headers, update_validators,
+    parse_feed, item_model_mapper, create_or_update_categories, create_or_update_channel, create_items,
+    update_high_water_mark, update_search_index, log_task_info
+)
+from .feed_archive import archive_feed, get_feed_archive
+from .health import record_failure, record_success, refreshable_feeds_q
+from .fetch_engine import BatchFetcher, FetchResult
+from .parse_pool import ParsePool, get_parse_pool
+from .payload_store import get_payload_store
 from .models import XmlLink, Channel
+from .rate_limit import HostRateLimited
+from .scheduling import claim_due_feeds, schedule_next_fetch
+from .single_flight import get_feed_leases
+
+UPDATE_RSSFEEDS_LEASE = 'update_rssfeeds'
+
+
+@worker_process_init.connect
+def warm_category_cache(**kwargs):
+    try:
+        category_resolver.warm()
+    except DatabaseError:
+        pass  # resolve() warms the cache lazily on first use
+
+
+def start_ingest(xml_link, response, parse_pool=None):
+    """
+    Skip an unchanged feed or start parsing it, inline or in the parse pool.
+
+    Returns:
+        tuple: (content_hashes, full_scan, Future of the parsed data), or None if the feed was unchanged.
+    """
+    if response.status_code == 304:
+        return None
+
+    content_hashes = get_content_hashes(response.content)
+    if is_unchanged(xml_link, content_hashes):
+        update_validators(xml_link, response, content_hashes)
+        return None
+
+    archive_feed(xml_link, response.content, content_hashes[0])
+    channel = Channel.objects.filter(xml_link=xml_link).first()
+    full_scan = needs_full_scan(channel)
+    parse_pool = parse_pool or ParsePool(workers=0)
+    future = parse_pool.submit(xml_link, response.content, incremental_channel=None if full_scan else channel)
+    return content_hashes, full_scan, future
+
+
+def finish_ingest(xml_link, response, started, correlation_id):
+    """
+    Persist the parsed data of a feed started with start_ingest.
 
+    The items and the feed's validators are saved in one transaction; indexing and the update notification
+    are then handed to the index and notify stages, so an Elasticsearch or broker outage is retried there
+    instead of failing the refresh of a feed that is already saved. The items of a streamed feed are only
+    parsed while they are persisted, so errors raised while iterating them count as parse errors too.
 
-@shared_task(base=MyTask, bind=True, task_time_limit=60, acks_late=True)
-def xml_link_creation(self, xml_link, correlation_id):
-    xml_link = XmlLink.objects.get(xml_link=xml_link)
+    Returns:
+        str: 'exist' if the feed was unchanged, otherwise the status of create_or_update_channel.
+    """
+    if started is None:
+        return 'exist'
 
-    [parsed_data, model] = parse_data(xml_link)
+    content_hashes, full_scan, future = started
+    try:
+        with parse_errors():
+            parsed_data = future.result()
+        parsed_data['podcast_data'] = iter_parsed_items(parsed_data['podcast_data'])
+        with transaction.atomic():
+            channel, status, model, updated_items = persist_feed(xml_link, parsed_data, full_scan)
+            update_validators(xml_link, response, content_hashes)
+    except PermanentError:
+        update_validators(xml_link, response, content_hashes)  # the same body is not parsed again next time
+        raise
+    if status != 'exist':
+        chain(
+            index_feed_stage.s(get_persisted(channel, status, model, updated_items), correlation_id),
+            notify_feed_stage.s(correlation_id),
+        ).delay()
+    return status
+
+
+@contextmanager
+def parse_errors():
+    """
+    Re-raise an unexpected error of a parse as UnparsableFeed, so it is recorded as the feed's failure.
+    Transient errors and a broken parse pool are not the body's fault and are raised as they are.
+    """
+    try:
+        yield
+    except (PermanentError, *TRANSIENT_ERRORS, BrokenProcessPool):
+        raise
+    except Exception as e:
+        raise UnparsableFeed(f'Could not parse the feed: {e!r}') from e
+
+
+def iter_parsed_items(items):
+    """
+    Yield the parsed items, raising the errors of a lazy parse as parse_errors() does.
+    """
+    with parse_errors():
+        yield from items
+
+
+def persist_feed(xml_link, parsed_data, full_scan):
+    """
+    Save the categories, channel and items of a parsed feed.
+
+    Only changed bodies reach this point, so the items are compared even when the channel's last_update did
+    not change: many feeds edit an item without touching the channel's <pubDate>.
+
+    Returns:
+        tuple: (channel, status of create_or_update_channel, item model, existing items that were updated).
+            The status is 'updated' rather than 'exist' if items of an unchanged channel were updated.
+    """
+    model = item_model_mapper(xml_link.rss_type.name)[1]
     channel_data = parsed_data['channel_data']['data']
     categories = create_or_update_categories(parsed_data['channel_data']['categories'])
 
@@ -19,29 +139,257 @@ def xml_link_creation(self, xml_link, correlation_id):
     if status != 'exist':
         channel.category.set(categories)
         channel.save()
-        podcast_data = parsed_data['podcast_data']
-        create_items(model, channel, podcast_data)
+    updated_items = create_items(model, channel, parsed_data['podcast_data'])
+    update_high_water_mark(model, channel, full_scan)
+    if status == 'exist' and updated_items:
+        status = 'updated'
+    return channel, status, model, updated_items
+
 
-        data = {
-            'channel_id': channel.id,
-            'data': f'{channel.title} has been updated'
+def get_persisted(channel, status, model, updated_items):
+    """
+    Describe a persisted feed for the index and notify stages.
+    """
+    return {
+        'status': status,
+        'channel_id': channel.id,
+        'model': model.__name__,
+        'item_ids': [item.pk for item in updated_items],
+    }
+
+
+def publish_channel_update(channel):
+    data = {
+        'channel_id': channel.id,
+        'data': f'{channel.title} has been updated'
+    }
+    publisher = EventPublisher()
+    publisher.publish_event('update_rss', 'update_rss', data=data)
+    publisher.close_connection()
+
+
+@shared_task(base=MyTask, bind=True, time_limit=60, acks_late=True)
+def xml_link_creation(self, xml_link, correlation_id, lease=None):
+    """
+    Fetch stage of the staged ingest pipeline (fetch -> parse -> persist -> index -> notify).
+
+    Each stage is a task on its own queue with its own time limit and retry policy, so a failure only
+    repeats the failed stage. The body and the parsed feed are handed on by reference through the
+    PayloadStore, never through the broker. Unchanged feeds end the pipeline here.
+
+    Only transient errors are retried (see core.exceptions). A permanent failure of any stage, e.g. a 404 or
+    a malformed body, or a transient one that outlasted the retries, is recorded in the feed's health (see
+    rssfeeds.health), which backs off its next fetch.
+
+    The feed's single-flight lease taken by enqueue_feed_refresh is handed on to the parse and persist
+    stages, and released by the task that ends the pipeline (see MyTask).
+    """
+    xml_link = XmlLink.objects.select_related('rss_type').get(xml_link=xml_link)
+
+    try:
+        response = fetch_feed(xml_link)
+    except HostRateLimited as e:
+        raise self.retry(exc=e, countdown=e.retry_after)
+    except PermanentError as e:
+        record_failure(xml_link, e)
+        raise
+    except TRANSIENT_ERRORS as e:
+        # Autoretry gives up after this attempt; an outage of our own services is not the feed's fault
+        last_attempt = self.request.retries >= self.retry_kwargs.get('max_retries', self.max_retries)
+        if last_attempt and isinstance(e, FEED_ERRORS):
+            record_failure(xml_link, e)
+        raise
+
+    status = 'fetched'
+    content_hashes = None if response.status_code == 304 else get_content_hashes(response.content)
+    if content_hashes is None or is_unchanged(xml_link, content_hashes):
+        status = 'exist'
+        if content_hashes:
+            update_validators(xml_link, response, content_hashes)
+        schedule_next_fetch(xml_link)
+        record_success(xml_link, response.elapsed, len(response.content))
+    else:
+        archive_feed(xml_link, response.content, content_hashes[0])
+        fetched = {
+            'xml_link_id': xml_link.id,
+            'status_code': response.status_code,
+            'headers': get_validator_headers(response),
+            'content_hashes': content_hashes,
+            'elapsed': response.elapsed,
+            'size': len(response.content),
+            'body': get_payload_store().put(response.content),
         }
-        publisher = EventPublisher()
-        publisher.publish_event('update_rss', 'update_rss', data=data)
-        publisher.close_connection()
+        chain(
+            parse_feed_stage.s(fetched, correlation_id, lease=lease),
+            persist_feed_stage.s(correlation_id, lease=lease),
+            index_feed_stage.s(correlation_id),
+            notify_feed_stage.s(correlation_id),
+        ).delay()
+        self.hand_on_lease()
 
     return {
         'status': status,
-        'message': f'Task {self.name} completed successfully for XML link: {xml_link}'
+        'message': f'Task {self.name} completed successfully for XML link: {xml_link}',
+        'connection_reused': response.connection_reused
+    }
+
+
+def get_fetched_response(xml_link, fetched):
+    return FetchResult(xml_link.xml_link, fetched['status_code'], fetched['headers'])
+
+
+@shared_task(base=MyTask, bind=True, soft_time_limit=120, time_limit=150, acks_late=True,
+             retry_kwargs={'max_retries': 3})
+def parse_feed_stage(self, fetched, correlation_id, lease=None):
+    """
+    Parse stage: parse the stored body and store the parsed feed. Parsing is deterministic, so a malformed,
+    unsupported or otherwise unparsable body fails at once; only transient Redis and database errors are
+    retried.
+
+    The items are stored in FEED_ITEM_BATCH_SIZE chunks as they are parsed, so a large, streamed feed is
+    never held in memory or in a single Redis value as a whole.
+    """
+    xml_link = XmlLink.objects.select_related('rss_type').get(id=fetched['xml_link_id'])
+    payload_store = get_payload_store()
+    content = payload_store.get(fetched['body'])
+
+    channel = Channel.objects.filter(xml_link=xml_link).first()
+    full_scan = needs_full_scan(channel)
+    try:
+        with parse_errors():
+            parsed_data = parse_feed(xml_link.rss_type.name, content, None if full_scan else channel)
+            item_keys = payload_store.put_chunks(parsed_data.pop('podcast_data'), settings.FEED_ITEM_BATCH_SIZE)
+    except PermanentError as e:
+        record_failure(xml_link, e)
+        update_validators(xml_link, get_fetched_response(xml_link, fetched), fetched['content_hashes'])
+        payload_store.delete(fetched['body'])
+        raise
+
+    parsed = {key: value for key, value in fetched.items() if key != 'body'}
+    parsed['full_scan'] = full_scan
+    parsed['parsed'] = payload_store.put_object(parsed_data)
+    parsed['items'] = item_keys
+    payload_store.delete(fetched['body'])
+    self.hand_on_lease()
+    return parsed
+
+
+@shared_task(base=MyTask, bind=True, soft_time_limit=270, time_limit=300, acks_late=True,
+             retry_kwargs={'max_retries': 8})
+def persist_feed_stage(self, parsed, correlation_id, lease=None):
+    """
+    Persist stage: save the parsed feed in one transaction, so a retry after e.g. a deadlock starts clean.
+    Data the database rejects (a value too long for its column, a broken constraint) fails at once.
+
+    Returns:
+        dict: The channel and the ids of updated items for the index and notify stages, or None if the
+            channel was unchanged.
+    """
+    xml_link = XmlLink.objects.select_related('rss_type').get(id=parsed['xml_link_id'])
+    payload_store = get_payload_store()
+    parsed_data = payload_store.get_object(parsed['parsed'])
+    parsed_data['podcast_data'] = payload_store.iter_chunks(parsed['items'])
+
+    try:
+        with transaction.atomic():
+            channel, status, model, updated_items = persist_feed(xml_link, parsed_data, parsed['full_scan'])
+            update_validators(xml_link, get_fetched_response(xml_link, parsed), parsed['content_hashes'])
+    except (DataError, IntegrityError, PermanentError) as e:
+        record_failure(xml_link, e)
+        payload_store.delete(parsed['parsed'], *parsed['items'])
+        raise
+    schedule_next_fetch(xml_link)
+    record_success(xml_link, parsed.get('elapsed'), parsed.get('size'))
+    payload_store.delete(parsed['parsed'], *parsed['items'])
+
+    if status == 'exist':
+        return None
+    return get_persisted(channel, status, model, updated_items)
+
+
+@shared_task(base=MyTask, bind=True, soft_time_limit=120, time_limit=150, acks_late=True,
+             autoretry_for=(*TRANSIENT_ERRORS, ElasticsearchConnectionError))
+def index_feed_stage(self, persisted, correlation_id):
+    """
+    Index stage: refresh the search documents of the items the persist stage updated.
+    """
+    if persisted is None:
+        return None
+    model = item_model_mapper(persisted['model'])[1]
+    update_search_index(model, list(model.objects.filter(id__in=persisted['item_ids'])))
+    return persisted
+
+
+@shared_task(base=MyTask, bind=True, time_limit=60, acks_late=True,
+             autoretry_for=(*TRANSIENT_ERRORS, AMQPConnectionError))
+def notify_feed_stage(self, persisted, correlation_id):
+    """
+    Notify stage: publish the update_rss event for a created or updated channel.
+    """
+    if persisted is None:
+        return None
+    publish_channel_update(Channel.objects.get(id=persisted['channel_id']))
+    return {
+        'status': persisted['status'],
+        'message': f'Task {self.name} notified the update of channel {persisted["channel_id"]}'
+    }
+
+
+@shared_task(base=MyTask, bind=True, soft_time_limit=900, time_limit=1000, acks_late=True)
+def fetch_feeds_batch(self, xml_link_ids, correlation_id, lease=None):
+    xml_links = list(XmlLink.objects.select_related('rss_type').filter(id__in=xml_link_ids))
+    fetcher = BatchFetcher()
+    results = fetcher.run(xml_links)
+
+    statuses = Counter()
+
+    @contextmanager
+    def refreshing(xml_link):
+        try:
+            yield
+        except HostRateLimited:
+            statuses['rate_limited'] += 1
+        except PermanentError as e:
+            statuses['permanent_error'] += 1
+            record_failure(xml_link, e)
+        except Exception as e:
+            statuses['failed'] += 1
+            if isinstance(e, FEED_ERRORS):
+                record_failure(xml_link, e)  # an outage of our own services is not the feed's fault
+            log_task_info(
+                task_name='fetch_feeds_batch', level='warning',
+                message=f'Failed to refresh XML link: {xml_link.xml_link}',
+                task_id=self.request.id, args=[xml_link.xml_link, correlation_id], kwargs={}, exception=e
+            )
+
+    # Hand every body to the parse pool first, then persist the feeds in order as their parses complete
+    parse_pool = get_parse_pool()
+    started = []
+    for xml_link, result in zip(xml_links, results):
+        with refreshing(xml_link):
+            result.raise_for_status()
+            started.append((xml_link, result, start_ingest(xml_link, result, parse_pool)))
+    for xml_link, result, ingest in started:
+        with refreshing(xml_link):
+            statuses[finish_ingest(xml_link, result, ingest, correlation_id)] += 1
+            schedule_next_fetch(xml_link)
+            record_success(xml_link, result.elapsed, len(result.content))
+
+    return {
+        'status': 'success',
+        'message': f'Task {self.name} refreshed {len(xml_links)} XML links',
+        'statuses': dict(statuses),
+        'connections': dict(fetcher.connections)
     }
 
 
-@shared_task(base=MyTask, bind=True, soft_time_limit=900, task_time_limit=1000, acks_late=True)
-def update_rssfeeds(self, correlation_id):
-    xml_links = XmlLink.objects.all()
+@shared_task(base=MyTask, bind=True, soft_time_limit=900, time_limit=1000, acks_late=True)
+def update_rssfeeds(self, correlation_id, lease=None):
+    xml_links = XmlLink.objects.filter(refreshable_feeds_q())
+    xml_link_ids = []
     for xml_link in xml_links:
         if Channel.objects.filter(xml_link=xml_link).exists():
-            xml_link_creation.delay(xml_link.xml_link, correlation_id)
+            xml_link_ids.append(xml_link.id)
         else:
             xml_link.delete()  # add is_deleted to model
             log_task_info(
@@ -49,8 +397,79 @@ def update_rssfeeds(self, correlation_id):
                 message=f'XML link deleted due to no related channel: {xml_link.xml_link}',
                 task_id=self.request.id, args=[xml_link.xml_link], retval='XML link deleted', kwargs={}
             )
+    enqueue_fetch_batches(xml_link_ids, correlation_id)
 
     return {
         'status': 'success',
         'message': f'Task {self.name} completed successfully for {len(xml_links)} XML links'
     }
+
+
+@shared_task(base=MyTask, bind=True, soft_time_limit=240, time_limit=270, acks_late=True)
+def schedule_due_feeds(self, correlation_id):
+    xml_link_ids = claim_due_feeds(settings.FEED_SCHEDULER_MAX_FEEDS)
+    enqueue_fetch_batches(xml_link_ids, correlation_id)
+
+    return {
+        'status': 'success',
+        'message': f'Task {self.name} enqueued {len(xml_link_ids)} due XML links'
+    }
+
+
+@shared_task(base=MyTask, bind=True, soft_time_limit=1800, time_limit=1900, acks_late=True)
+def prune_feed_archive(self, correlation_id):
+    deleted_entries, deleted_segments = get_feed_archive().prune(settings.FEED_ARCHIVE_KEEP_VERSIONS)
+
+    return {
+        'status': 'success',
+        'message': f'Task {self.name} pruned {deleted_entries} archived feed bodies and {deleted_segments} segments'
+    }
+
+
+def enqueue_fetch_batches(xml_link_ids, correlation_id):
+    """
+    Enqueue fetch_feeds_batch tasks for the given feeds, skipping the feeds whose refresh is already queued
+    or running. Each batch holds the single-flight leases of its feeds until it ends.
+
+    Returns:
+        int: The number of feeds enqueued.
+    """
+    leases = get_feed_leases()
+    batch_size = settings.FEED_FETCH_BATCH_SIZE
+    enqueued = 0
+    for i in range(0, len(xml_link_ids), batch_size):
+        token = uuid()
+        batch = leases.acquire(xml_link_ids[i:i + batch_size], token)
+        if batch:
+            fetch_feeds_batch.delay(batch, correlation_id, lease={'names': batch, 'token': token})
+            enqueued += len(batch)
+    return enqueued
+
+
+def enqueue_feed_refresh(xml_link, correlation_id):
+    """
+    Enqueue the ingest pipeline of a feed unless a refresh of it is already queued or running, in which case
+    the trigger is collapsed into that refresh.
+
+    Returns:
+        bool: Whether a refresh was enqueued.
+    """
+    token = uuid()
+    if not get_feed_leases().acquire([xml_link.id], token):
+        return False
+    xml_link_creation.delay(xml_link.xml_link, correlation_id, lease={'names': [xml_link.id], 'token': token})
+    return True
+
+
+def enqueue_update_rssfeeds(correlation_id):
+    """
+    Enqueue update_rssfeeds unless a run of it is already queued or running.
+
+    Returns:
+        bool: Whether a run was enqueued.
+    """
+    token = uuid()
+    if not get_feed_leases().acquire([UPDATE_RSSFEEDS_LEASE], token):
+        return False
+    update_rssfeeds.delay(correlation_id, lease={'names': [UPDATE_RSSFEEDS_LEASE], 'token': token})
+    return True
@@ -1,3 +1,286 @@
-from django.test import TestCase
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core.exceptions import MalformedFeed, PermanentHTTPError, UnparsableFeed
+from core.models import Type
+from core.parsers import PodcastParser
+from .fetch_engine import BatchFetcher
+from .http_client import FeedHTTPClient, FeedTooLarge, FetchResult, NotAFeed
+from .models import Channel, Podcast, XmlLink
+from .rate_limit import HostRateLimited, HostRateLimiter
+from .tasks import finish_ingest, start_ingest
+from .utils import create_items, fetch_feed, iter_new_items, needs_full_scan
+
+FEED = (b'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel><title>Stand-in</title>'
+        b'<item><title>Episode 1</title><guid>1</guid></item></channel></rss>')
+ETAG = '"v1"'
+
+
+class FeedHandler(BaseHTTPRequestHandler):
+    """
+    Serves the responses of a few typical feed hosts: a feed with an ETag, a missing feed, a throttled host,
+    an HTML page and an oversized feed. Connections are kept alive, and the client port of each one is recorded.
+    """
+    protocol_version = 'HTTP/1.1'
+    connections = []
+
+    def setup(self):
+        super().setup()
+        self.connections.append(self.client_address)
+
+    def do_GET(self):
+        if self.path == '/feed.xml':
+            if self.headers.get('If-None-Match') == ETAG:
+                self.respond(304)
+            else:
+                self.respond(200, FEED, {'Content-Type': 'application/rss+xml', 'ETag': ETAG})
+        elif self.path == '/throttled.xml':
+            self.respond(429, b'', {'Retry-After': '120'})
+        elif self.path == '/page.html':
+            self.respond(200, b'<!DOCTYPE html><html><body>Not a feed</body></html>', {'Content-Type': 'text/html'})
+        elif self.path == '/large.xml':
+            self.respond(200, FEED[:-len(b'</channel></rss>')] + b'<item/>' * 1000 + b'</channel></rss>')
+        else:
+            self.respond(404)
+
+    def respond(self, status, body=b'', headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@override_settings(FEED_MAX_BODY_BYTES=4096)
+class FeedDownloadTests(SimpleTestCase):
+    """
+    Exercises both download paths, fetch_feed and the BatchFetcher, against a local HTTP stand-in.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), FeedHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_port}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        # Throttling is not under test: every token is granted at once and nothing reaches Redis
+        rate_limiter = HostRateLimiter(connection=mock.MagicMock())
+        patcher = mock.patch.object(rate_limiter, 'reserve', return_value=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for module in ('rssfeeds.utils', 'rssfeeds.fetch_engine'):
+            patcher = mock.patch(f'{module}.get_rate_limiter', return_value=rate_limiter)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def get_xml_link(self, path, etag=None):
+        return XmlLink(xml_link=f'{self.base_url}{path}', etag=etag)
+
+    def test_fetch_feed(self):
+        response = fetch_feed(self.get_xml_link('/feed.xml'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, FEED)
+        self.assertEqual(response.headers['ETag'], ETAG)
+
+    def test_fetch_feed_not_modified(self):
+        response = fetch_feed(self.get_xml_link('/feed.xml', etag=ETAG))
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_fetch_feed_errors(self):
+        cases = [
+            ('/missing.xml', PermanentHTTPError),
+            ('/throttled.xml', HostRateLimited),
+            ('/page.html', NotAFeed),
+            ('/large.xml', FeedTooLarge),
+        ]
+        for path, error in cases:
+            with self.subTest(path=path), self.assertRaises(error):
+                fetch_feed(self.get_xml_link(path))
+
+    def test_fetch_feed_keeps_connection_alive(self):
+        client = FeedHTTPClient()
+        self.addCleanup(client.close)
+        connections = len(FeedHandler.connections)
+        results = [client.get(f'{self.base_url}/feed.xml')]
+        results += [client.get(f'{self.base_url}/feed.xml', headers={'If-None-Match': ETAG}) for _ in range(3)]
+        results.append(client.get(f'{self.base_url}/missing.xml'))
+
+        self.assertEqual([result.status_code for result in results], [200, 304, 304, 304, 404])
+        self.assertEqual([result.connection_reused for result in results], [False, True, True, True, True])
+        self.assertEqual(len(FeedHandler.connections) - connections, 1)
+
+    def test_batch_fetcher(self):
+        xml_links = [
+            self.get_xml_link('/feed.xml'),
+            self.get_xml_link('/feed.xml', etag=ETAG),
+            self.get_xml_link('/missing.xml'),
+            self.get_xml_link('/throttled.xml'),
+            self.get_xml_link('/page.html'),
+            self.get_xml_link('/large.xml'),
+        ]
+        fetched, not_modified, missing, throttled, page, large = BatchFetcher().run(xml_links)
+
+        self.assertEqual((fetched.status_code, fetched.content, fetched.error), (200, FEED, None))
+        self.assertEqual((not_modified.status_code, not_modified.content), (304, b''))
+        self.assertIsInstance(missing.error, PermanentHTTPError)
+        self.assertEqual(missing.status_code, 404)
+        self.assertIsInstance(throttled.error, HostRateLimited)
+        self.assertEqual(throttled.error.retry_after, 120)
+        self.assertIsInstance(page.error, NotAFeed)
+        self.assertIsInstance(large.error, FeedTooLarge)
+        for result in (missing, throttled, page, large):
+            with self.subTest(url=result.url), self.assertRaises(type(result.error)):
+                result.raise_for_status()
+
+
+Item = namedtuple('Item', ['guid', 'pub_date'])
+
+
+def podcast_feed(*items):
+    """
+    Build a podcast feed listing the given (guid, title) items, in order.
+    """
+    return '<rss version="2.0"><channel><title>Stand-in</title>{}</channel></rss>'.format(''.join(
+        f'<item><title>{title}</title><guid>{guid}</guid><enclosure url="https://example.com/{guid}.mp3"/></item>'
+        for guid, title in items
+    )).encode()
+
+
+def podcast_items(*items):
+    """
+    Parse a podcast feed listing the given (guid, title) items, in order.
+    """
+    return list(PodcastParser(podcast_feed(*items)).iter_items())
+
+
+class CreateItemsTests(TestCase):
+    """
+    Stores the items of consecutive refreshes of a feed with create_items.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        xml_link = XmlLink.objects.create(xml_link='https://example.com/feed.xml',
+                                          rss_type=Type.objects.create(name='podcast'))
+        cls.channel = Channel.objects.create(title='Stand-in', author='Author', owner='Owner', xml_link=xml_link)
+
+    def get_titles(self):
+        return dict(Podcast.objects.filter(channel=self.channel).values_list('guid', 'title'))
+
+    def test_first_insert(self):
+        updated = create_items(Podcast, self.channel, podcast_items(('1', 'Episode 1'), ('2', 'Episode 2')))
+        self.assertEqual(updated, [])
+        self.assertEqual(self.get_titles(), {'1': 'Episode 1', '2': 'Episode 2'})
+
+    def test_unchanged_reingest(self):
+        items = podcast_items(('1', 'Episode 1'), ('2', 'Episode 2'))
+        create_items(Podcast, self.channel, items)
+        with self.assertNumQueries(1):
+            self.assertEqual(create_items(Podcast, self.channel, items), [])
+        self.assertEqual(self.get_titles(), {'1': 'Episode 1', '2': 'Episode 2'})
+
+    def test_edited_item(self):
+        create_items(Podcast, self.channel, podcast_items(('1', 'Episode 1'), ('2', 'Episode 2')))
+        updated = create_items(Podcast, self.channel, podcast_items(('1', 'Episode 1'), ('2', 'Episode 2, edited')))
+        self.assertEqual([(item.guid, item.title) for item in updated], [('2', 'Episode 2, edited')])
+        self.assertEqual(self.get_titles(), {'1': 'Episode 1', '2': 'Episode 2, edited'})
+
+    def test_repeated_guid(self):
+        items = podcast_items(('dup', 'First copy'), ('1', 'Episode 1'), ('dup', 'Second copy'))
+        self.assertEqual(create_items(Podcast, self.channel, items), [])
+        self.assertEqual(create_items(Podcast, self.channel, items), [])
+        self.assertEqual(self.get_titles(), {'dup': 'First copy', '1': 'Episode 1'})
+
+
+@override_settings(FEED_EARLY_STOP_KNOWN_RUN=3, FEED_FULL_SCAN_INTERVAL=timedelta(days=7))
+class IncrementalParseTests(SimpleTestCase):
+    """
+    Checks which items an incremental refresh passes on, and when a feed is scanned in full instead.
+    """
+
+    def setUp(self):
+        self.start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.known = [Item(f'known-{day}', self.start + timedelta(days=day)) for day in range(10)]
+        self.new = [Item(f'new-{day}', self.start + timedelta(days=day)) for day in (10, 11)]
+        self.channel = Channel(recent_guids=[item.guid for item in self.known],
+                               newest_item_pub_date=self.known[-1].pub_date)
+
+    def get_guids(self, items):
+        return [item.guid for item in iter_new_items(items, self.channel)]
+
+    def test_newest_first_stops_after_known_run(self):
+        items = self.new[::-1] + self.known[::-1]
+        # The known items before the stop are passed on, so edits of recent items are picked up
+        self.assertEqual(self.get_guids(items), ['new-11', 'new-10', 'known-9', 'known-8'])
+
+    def test_oldest_first_is_read_to_the_end(self):
+        items = self.known + self.new
+        self.assertEqual(self.get_guids(items), [item.guid for item in items])
+
+    def test_channel_without_items_is_read_to_the_end(self):
+        self.channel = Channel()
+        items = self.new[::-1] + self.known[::-1]
+        self.assertEqual(self.get_guids(items), [item.guid for item in items])
+
+    def test_needs_full_scan(self):
+        now = datetime.now(timezone.utc)
+        self.assertTrue(needs_full_scan(None))
+        self.assertTrue(needs_full_scan(Channel()))
+        self.assertFalse(needs_full_scan(Channel(last_full_scan_at=now - timedelta(days=6))))
+        self.assertTrue(needs_full_scan(Channel(last_full_scan_at=now - timedelta(days=8))))
+
+
+@override_settings(FEED_STREAM_PARSE_THRESHOLD=100, FEED_XML_BACKEND='etree', FEED_ARCHIVE_ENABLED=False)
+class FinishIngestTests(TestCase):
+    """
+    Ingests streamed feeds through the batch path, whose items are parsed while they are persisted.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.xml_link = XmlLink.objects.create(xml_link='https://example.com/feed.xml',
+                                              rss_type=Type.objects.create(name='Podcast'))
+
+    def ingest(self, content):
+        response = FetchResult(self.xml_link.xml_link, 200, {'ETag': ETAG}, content)
+        return finish_ingest(self.xml_link, response, start_ingest(self.xml_link, response), 'correlation-id')
+
+    def test_parse_errors_while_persisting(self):
+        items = [(str(i), f'Episode {i}') for i in range(10)]
+        feed = podcast_feed(*items)
+        item_parser = PodcastParser.item_parser
+        cases = [
+            ('malformed item', feed.replace(b'Episode 5', b'Episode & 5'), MalformedFeed, None),
+            ('parser bug', feed, UnparsableFeed, KeyError('bug')),
+        ]
+        for case, content, error, parser_error in cases:
+            def parse_item(parser, item):
+                if parser_error and item.findtext('guid') == '5':
+                    raise parser_error
+                return item_parser(parser, item)
+
+            XmlLink.objects.filter(pk=self.xml_link.pk).update(etag=None, content_hash=None)
+            with self.subTest(case=case), mock.patch.object(PodcastParser, 'item_parser', parse_item):
+                with self.assertRaises(error):
+                    self.ingest(content)
+                self.xml_link.refresh_from_db()
+                self.assertEqual(self.xml_link.etag, ETAG)  # the same body is not parsed again next time
+                self.assertFalse(Podcast.objects.exists())
@@ -4,6 +4,7 @@ from . import views
 
 router = DefaultRouter()
 router.register('rssfeeds', views.XmlLinkViewSet)
+router.register('feed_health', views.FeedHealthViewSet, basename='feed_health')
 router.register('channels', views.ChannelViewSet)
 router.register('podcasts', views.PodcastViewSet)
 router.register('news', views.NewsViewSet)
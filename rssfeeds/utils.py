@@ -1,17 +1,192 @@
+from django.conf import settings
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
+import hashlib
+import io
 import json
 import logging
+import re
+from collections import defaultdict
+from functools import lru_cache
+from itertools import islice
+from urllib.parse import urlsplit
 
-from core.parsers import PodcastParser, NewsParser
-from core.models import Category
+from django_elasticsearch_dsl.registries import registry
+
+from core.parsers import PodcastParser, NewsParser, get_parser_class
+from core.category_resolver import category_resolver
+from .http_client import get_http_client
+from .rate_limit import get_rate_limiter
 from .models import Podcast, News, Channel
-import requests
 
 
-def parse_data(xml_link):
-    response = requests.get(xml_link.xml_link)
-    [Parser, model] = item_model_mapper(xml_link.rss_type.name)
-    return [Parser(response.text).parse_xml_and_create_records(), model]
+def get_conditional_headers(xml_link):
+    headers = {}
+    if xml_link.etag:
+        headers['If-None-Match'] = xml_link.etag
+    if xml_link.last_modified:
+        headers['If-Modified-Since'] = xml_link.last_modified
+    return headers
+
+
+def fetch_feed(xml_link):
+    """
+    Download a feed through the process-wide keep-alive client, revalidating it against the validators
+    stored from the last fetch. The request waits for its host's rate-limit token first.
+
+    Returns:
+        FetchResult: The downloaded feed; its status_code is 304 if the feed was not modified.
+
+    Raises:
+        HostRateLimited: If the host is throttled or answered with 429/Retry-After.
+        FeedRejected: If the body is larger than FEED_MAX_BODY_BYTES or not an XML document.
+    """
+    host = urlsplit(xml_link.xml_link).netloc
+    rate_limiter = get_rate_limiter()
+    rate_limiter.acquire(host)
+    response = get_http_client().get(xml_link.xml_link, headers=get_conditional_headers(xml_link))
+    rate_limiter.check_response(host, response.status_code, response.headers)
+    response.raise_for_status()
+    return response
+
+
+def get_content_hashes(body):
+    """
+    Hash a downloaded feed body for change detection.
+
+    The normalized hash ignores the elements listed in FEED_VOLATILE_ELEMENTS (e.g. <lastBuildDate>),
+    which many hosts rewrite on every request even when no item changed.
+
+    Returns:
+        tuple: (content_hash, normalized_hash); normalized_hash is None when FEED_NORMALIZED_HASH is off.
+    """
+    content_hash = hashlib.sha256(body).hexdigest()
+    normalized_hash = None
+    if settings.FEED_NORMALIZED_HASH:
+        volatile_elements_re = get_volatile_elements_re(tuple(settings.FEED_VOLATILE_ELEMENTS))
+        normalized_hash = hashlib.sha256(volatile_elements_re.sub(b'', body)).hexdigest()
+    return content_hash, normalized_hash
+
+
+@lru_cache
+def get_volatile_elements_re(volatile_elements):
+    tags = b'|'.join(re.escape(tag.encode()) for tag in volatile_elements)
+    return re.compile(rb'<((?:[\w.-]+:)?(?:' + tags + rb'))\b[^>]*?(?:/>|>.*?</\1\s*>)', re.DOTALL)
+
+
+def is_unchanged(xml_link, content_hashes):
+    content_hash, normalized_hash = content_hashes
+    if content_hash == xml_link.content_hash:
+        return True
+    return normalized_hash is not None and normalized_hash == xml_link.normalized_hash
+
+
+def get_validator_headers(response):
+    """
+    Return the response headers update_validators needs, so a fetched feed can be described without its body.
+    """
+    headers = {name: response.headers.get(name) for name in ('ETag', 'Last-Modified', 'Content-Length')}
+    if not headers['Content-Length']:
+        headers['Content-Length'] = str(len(response.content))
+    return headers
+
+
+def update_validators(xml_link, response, content_hashes):
+    content_length = response.headers.get('Content-Length')
+    xml_link.etag = response.headers.get('ETag')
+    xml_link.last_modified = response.headers.get('Last-Modified')
+    xml_link.content_length = int(content_length) if content_length and content_length.isdigit() \
+        else len(response.content)
+    xml_link.content_hash, xml_link.normalized_hash = content_hashes
+    xml_link.save(update_fields=['etag', 'last_modified', 'content_length', 'content_hash', 'normalized_hash'])
+
+
+def parse_feed(rss_type, content, incremental_channel=None):
+    """
+    Parse a feed body with the parser matching its format (sniffed from the body) and rss_type.
+
+    Bodies larger than FEED_STREAM_PARSE_THRESHOLD are parsed incrementally and their items are produced
+    lazily. This function only needs the body, so it can run in a parse worker process.
+
+    Args:
+        rss_type (str): The feed's type, 'Podcast' or 'News'.
+        content (bytes): The feed body.
+        incremental_channel (Channel, optional): When given, parsing stops after the channel's recent window
+            of known items (see iter_new_items).
+
+    Returns:
+        dict: The channel data and an iterable of the item records.
+
+    Raises:
+        UnsupportedFeedFormat: If the body is neither RSS 2.0 nor Atom.
+        MalformedFeed: If the body is not well-formed XML.
+    """
+    Parser = get_parser_class(content, rss_type)
+    if len(content) > settings.FEED_STREAM_PARSE_THRESHOLD:
+        parser = Parser(io.BytesIO(content), stream=True)
+    else:
+        parser = Parser(content)
+
+    if incremental_channel is None:
+        return parser.parse_xml_and_create_records()
+    return {
+        'channel_data': parser.parse_channel(),
+        'podcast_data': iter_new_items(parser.iter_items(), incremental_channel)
+    }
+
+
+def needs_full_scan(channel):
+    if channel is None or channel.last_full_scan_at is None:
+        return True
+    return channel.last_full_scan_at <= timezone.now() - settings.FEED_FULL_SCAN_INTERVAL
+
+
+def iter_new_items(items, channel):
+    """
+    Cut parsed items (newest first, as most feeds list them) off after the recent window of known items.
+
+    An item is known if its GUID is among the channel's recent GUIDs or it is not newer than the channel's
+    newest ingested pub_date. Parsing stops once FEED_EARLY_STOP_KNOWN_RUN consecutive known items are
+    seen, so unchanged back catalogues are never parsed. Every item before that point, known or not, is
+    passed on: create_items inserts the new ones and compares the fingerprints of the known ones, so edits
+    to recent items are picked up without waiting for a full scan.
+
+    A feed whose first dated item is older than the high-water mark lists its items oldest first, so its
+    new items come last; such a feed is parsed to the end.
+    """
+    known_guids = set(channel.recent_guids)
+    high_water_mark = channel.newest_item_pub_date
+    early_stop = True
+    order_checked = high_water_mark is None
+    known_run = 0
+    for item in items:
+        if not order_checked and item.pub_date:
+            order_checked = True
+            early_stop = item.pub_date >= high_water_mark
+        seen = item.guid in known_guids
+        if seen or (high_water_mark and item.pub_date and item.pub_date <= high_water_mark):
+            known_run += 1
+            if early_stop and known_run >= settings.FEED_EARLY_STOP_KNOWN_RUN:
+                return
+        else:
+            known_run = 0
+        yield item
+
+
+def update_high_water_mark(model, channel, full_scan):
+    recent_items = list(
+        model.objects
+        .filter(channel=channel, pub_date__isnull=False)
+        .order_by('-pub_date')
+        .values_list('guid', 'pub_date')[:settings.FEED_RECENT_GUIDS]
+    )
+    channel.recent_guids = [guid for guid, _ in recent_items]
+    channel.newest_item_pub_date = recent_items[0][1] if recent_items else None
+    update_fields = ['recent_guids', 'newest_item_pub_date']
+    if full_scan:
+        channel.last_full_scan_at = timezone.now()
+        update_fields.append('last_full_scan_at')
+    channel.save(update_fields=update_fields)
 
 
 def item_model_mapper(arg):
@@ -23,14 +198,7 @@ def item_model_mapper(arg):
 
 
 def create_or_update_categories(categories_data):
-    categories = []
-    for category_data in categories_data:
-        parent, _ = Category.objects.get_or_create(name=category_data.name)
-        categories.append(parent)
-        for child_data in category_data.children:
-            child, _ = Category.objects.get_or_create(name=child_data.name, parent=parent)
-            categories.append(child)
-    return categories
+    return category_resolver.resolve(categories_data)
 
 
 def create_or_update_channel(xml_link, channel_data):
@@ -49,9 +217,66 @@ def create_or_update_channel(xml_link, channel_data):
 
 
 def create_items(model, channel, podcast_data):
-    podcast_items = (model(channel=channel, **item) for item in podcast_data if
-                     not model.objects.filter(guid=item.get("guid")).exists())
-    model.objects.bulk_create(podcast_items)
+    """
+    Insert the parsed items that the channel does not have yet and update the ones whose content changed.
+
+    Items are processed in FEED_ITEM_BATCH_SIZE chunks: each chunk costs one query to load the channel's
+    existing GUIDs and fingerprints and one bulk INSERT. Existing items whose fingerprint differs are
+    reloaded and written back with bulk_update, limited to the fields that actually changed. Conflicts on
+    the (channel, guid) constraint, e.g. from a concurrent refresh of the same feed, are ignored. A GUID the
+    feed lists more than once is taken from its first occurrence only.
+
+    Returns:
+        list: The existing items that were updated.
+    """
+    podcast_data = iter(podcast_data)
+    seen = set()
+    updated_items = []
+    while batch := list(islice(podcast_data, settings.FEED_ITEM_BATCH_SIZE)):
+        guids = {item.guid for item in batch} - seen
+        known_fingerprints = dict(
+            model.objects.filter(channel=channel, guid__in=guids).values_list('guid', 'fingerprint')
+        )
+        podcast_items = []
+        changed_items = {}
+        for item in batch:
+            guid = item.guid
+            if guid in seen:
+                continue
+            seen.add(guid)
+            if guid not in known_fingerprints:
+                podcast_items.append(model(channel=channel, **item.as_model_kwargs()))
+            elif known_fingerprints[guid] != item.fingerprint:
+                changed_items[guid] = item
+        model.objects.bulk_create(podcast_items, ignore_conflicts=True)
+        if changed_items:
+            updated_items.extend(update_items(model, channel, changed_items))
+    return updated_items
+
+
+def update_items(model, channel, changed_items):
+    fields_to_update = defaultdict(list)
+    for obj in model.objects.filter(channel=channel, guid__in=changed_items.keys()):
+        item = changed_items[obj.guid]
+        changed_fields = tuple(key for key in item._fields if getattr(obj, key) != getattr(item, key))
+        if not changed_fields:
+            continue
+        for key in changed_fields:
+            setattr(obj, key, getattr(item, key))
+        fields_to_update[changed_fields].append(obj)
+
+    updated_items = []
+    for fields, objs in fields_to_update.items():
+        model.objects.bulk_update(objs, fields)
+        updated_items.extend(objs)
+    return updated_items
+
+
+def update_search_index(model, items):
+    if not items or not getattr(settings, 'ELASTICSEARCH_DSL_AUTOSYNC', True):
+        return
+    for document in registry.get_documents(models=[model]):
+        document().update(items)
 
 
 logger = logging.getLogger('elastic-logger')
@@ -1,6 +1,8 @@
 from django.utils.translation import gettext_lazy as _
 
 from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAdminUser
 from rest_framework.mixins import CreateModelMixin, DestroyModelMixin, ListModelMixin, RetrieveModelMixin
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -13,6 +15,7 @@ from .serializers import (
     ChannelSerializer,
     NewsSerializer,
     XmlLinkSerializer,
+    FeedHealthSerializer,
     ChannelDocumentSerializer,
     PodcastSerializer,
     PodcastDocumentSerializer,
@@ -38,8 +41,9 @@ from django_elasticsearch_dsl_drf.viewsets import BaseDocumentViewSet
 
 from .documents import ChannelDocument, PodcastDocument, NewsDocument
 
+from .health import release
 from .models import Channel, XmlLink, Podcast, News
-from .tasks import xml_link_creation, update_rssfeeds
+from .tasks import enqueue_feed_refresh, enqueue_update_rssfeeds
 from accounts.publishers import EventPublisher
 
 class XmlLinkViewSet(AuthenticationMixin, CreateModelMixin, DestroyModelMixin, ListModelMixin, RetrieveModelMixin,
@@ -73,7 +77,8 @@ class XmlLinkViewSet(AuthenticationMixin, CreateModelMixin, DestroyModelMixin, L
         rss_type = request.data.get('rss_type')
         obj, created = XmlLink.objects.get_or_create(xml_link=xml_link, rss_type_id=rss_type)
         correlation_id = request.headers.get("correlation-id")
-        xml_link_creation.delay(obj.xml_link, correlation_id)
+        if not enqueue_feed_refresh(obj, correlation_id):
+            return Response({'message': _('This feed is already being refreshed')}, status=status.HTTP_200_OK)
         return Response({'message': _('Your request is processing')}, status=status.HTTP_201_CREATED)
 
 
@@ -82,11 +87,51 @@ class UpdateRSSFeedsView(AuthenticationMixin, APIView):
     def get(self, request):
         correlation_id = request.headers.get("correlation-id")
 
-        update_rssfeeds.delay(correlation_id)
+        if not enqueue_update_rssfeeds(correlation_id):
+            return Response({'message': _('RSS Feeds are already being updated')}, status=status.HTTP_200_OK)
 
         return Response({'message': _('RSS Feeds have been updated')}, status=status.HTTP_200_OK)
 
 
+class FeedHealthViewSet(ListModelMixin, RetrieveModelMixin, GenericViewSet):
+    """
+    ViewSet for inspecting the fetch health of feeds and releasing quarantined ones.
+
+    Endpoints:
+    - GET /feed_health/: Feeds ordered by consecutive failures; `?quarantined=true` (or false) filters on
+      quarantine and `?ordering=` sorts by any health field.
+    - GET /feed_health/{id}/: The health of one feed, including its last error and the offending snippet.
+    - POST /feed_health/{id}/release/: Take a feed out of quarantine and make it due for an immediate fetch.
+
+    Permissions:
+        - Admin access required.
+    """
+
+    authentication_classes = (JWTAuthentication,)
+    permission_classes = (IsAdminUser,)
+    serializer_class = FeedHealthSerializer
+    queryset = XmlLink.objects.all()
+    filter_backends = [OrderingFilter]
+    ordering_fields = ['consecutive_failures', 'last_success_at', 'last_error_at', 'quarantined_at',
+                       'avg_fetch_seconds', 'avg_fetch_bytes']
+    ordering = ['-consecutive_failures', 'id']
+    pagination_class = LimitOffsetPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        quarantined = self.request.query_params.get('quarantined')
+        if quarantined is not None:
+            queryset = queryset.filter(quarantined_at__isnull=quarantined.lower() not in ('true', '1'))
+        return queryset
+
+    @action(detail=True, methods=['post'])
+    def release(self, request, pk=None):
+        xml_link = self.get_object()
+        release(XmlLink.objects.filter(pk=xml_link.pk))
+        xml_link.refresh_from_db()
+        return Response(self.get_serializer(xml_link).data, status=status.HTTP_200_OK)
+
+
 class ChannelViewSet(ListModelMixin, RetrieveModelMixin, GenericViewSet):
     """
     ViewSet for listing and retrieving Channels.